@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the RedactingFormatter redaction paths
+Usage: ./bench_redaction.py [--records 100000] [--repeat 3]
+Compares the regex pass over a formatted "key=value;" message with the
+structured paths, where the data is given as a mapping in the logging
+arguments or in extra={"data": ...}.
+"""
+import argparse
+import json
+import logging
+import random
+import time
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+
+def build_rows(count: int) -> list:
+    """
+    Returns count generated user rows.
+    """
+    rng = random.Random(0)
+    return [
+        {
+            "name": "User{}".format(i),
+            "email": "user{}@example.com".format(i),
+            "phone": "555-{:04d}".format(rng.randrange(10 ** 4)),
+            "ssn": "{:03d}-{:02d}-{:04d}".format(
+                rng.randrange(1000), rng.randrange(100),
+                rng.randrange(10 ** 4)),
+            "password": "{:x}".format(rng.getrandbits(64)),
+            "ip": "10.0.{}.{}".format(rng.randrange(256), rng.randrange(256)),
+            "last_login": "2019-11-14T06:16:24",
+            "user_agent": "Mozilla/5.0",
+        }
+        for i in range(count)
+    ]
+
+
+def make_record(row: dict, mode: str, template: str) -> logging.LogRecord:
+    """
+    Returns the log record of a row as logged in one of the modes: the
+    caller formats the message itself ("regex"), passes the row as the
+    logging arguments ("args") or as extra={"data": row} ("extra").
+    """
+    if mode == "regex":
+        return logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                                 template % row, None, None)
+    if mode == "args":
+        return logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                                 template, (row,), None)
+    record = logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                               "", None, None)
+    record.data = row
+    return record
+
+
+def measure(rows: list, mode: str, repeat: int) -> dict:
+    """
+    Times the creation and formatting of the record of every row,
+    keeping the best of repeat runs.
+    """
+    formatter = RedactingFormatter(list(PII_FIELDS))
+    template = "".join("{0}=%({0})s;".format(key) for key in rows[0])
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            formatter.format(make_record(row, mode, template))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "seconds": round(best, 6),
+        "records_per_second": round(len(rows) / best),
+        "sample": formatter.format(make_record(rows[0], mode, template)),
+    }
+
+
+def main():
+    """
+    Runs the benchmark and prints the results as JSON.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = build_rows(args.records)
+    results = {
+        mode: measure(rows, mode, args.repeat)
+        for mode in ("regex", "args", "extra")
+    }
+    print(json.dumps({"records": args.records, "results": results},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
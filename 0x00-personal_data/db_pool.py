@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Pooled DB-API connections to the personal data database.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+
+def connect_mysql():
+    """
+    Opens a MySQL connection configured by PERSONAL_DATA_DB_*.
+    """
+    import mysql.connector
+    return mysql.connector.connect(
+        host=os.getenv("PERSONAL_DATA_DB_HOST", "localhost"),
+        user=os.getenv("PERSONAL_DATA_DB_USERNAME", "root"),
+        password=os.getenv("PERSONAL_DATA_DB_PASSWORD", ""),
+        database=os.getenv("PERSONAL_DATA_DB_NAME", ""),
+    )
+
+
+def connect_sqlite():
+    """
+    Opens the SQLite database file named by PERSONAL_DATA_DB_NAME, an
+    in-memory database when it is empty.
+    """
+    return sqlite3.connect(
+        os.getenv("PERSONAL_DATA_DB_NAME") or ":memory:",
+        check_same_thread=False,
+    )
+
+
+DRIVERS = {"mysql": connect_mysql, "sqlite": connect_sqlite}
+PLACEHOLDERS = {"mysql": "%s", "sqlite": "?"}
+
+
+def driver_name() -> str:
+    """
+    Returns the driver chosen by PERSONAL_DATA_DB_DRIVER.
+    """
+    name = os.getenv("PERSONAL_DATA_DB_DRIVER", "mysql")
+    if name not in DRIVERS:
+        raise ValueError(f"unknown PERSONAL_DATA_DB_DRIVER: {name}")
+    return name
+
+
+def placeholder() -> str:
+    """
+    Returns the query parameter marker of the configured driver.
+    """
+    return PLACEHOLDERS[driver_name()]
+
+
+def ping(connection) -> bool:
+    """
+    Tells whether a connection still answers a trivial query.
+    """
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+class PooledConnection:
+    """
+    Connection borrowed from a ConnectionPool. It behaves like the
+    underlying connection, except that close() gives it back.
+    """
+
+    def __init__(self, pool: "ConnectionPool", connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name: str):
+        if self._connection is None:
+            raise AttributeError(f"connection returned to the pool: {name}")
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Gives the connection back to the pool, once.
+        """
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    It keeps up to size idle connections and opens up to overflow more
+    under load, which are closed when given back. Idle connections
+    older than idle_timeout seconds are closed instead of reused, and
+    the others are health-checked before being lent. acquire() waits at
+    most timeout seconds for a free connection.
+    """
+
+    def __init__(self, connect: Callable, size: int = 5, overflow: int = 10,
+                 idle_timeout: float = 300, timeout: float = 30,
+                 health_check: Callable = ping):
+        self.connect = connect
+        self.size = size
+        self.overflow = overflow
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.health_check = health_check
+        self._idle = deque()
+        self._condition = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+        self.created = 0
+        self.closed = 0
+        self.health_check_failures = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def acquire(self) -> PooledConnection:
+        """
+        Lends a connection, reusing an idle one when possible.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            connection = None
+            with self._condition:
+                while not self._idle and self._open >= \
+                        self.size + self.overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise TimeoutError("no free database connection")
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    expired = time.monotonic() - last_used > \
+                        self.idle_timeout
+                else:
+                    expired = False
+                if connection is None:
+                    self._open += 1
+                self._in_use += 1
+                if waited:
+                    self.record_wait(time.monotonic() - start)
+                    waited = False
+            if connection is None:
+                return PooledConnection(self, self.open_connection())
+            if not expired and self.health_check(connection):
+                return PooledConnection(self, connection)
+            if not expired:
+                with self._condition:
+                    self.health_check_failures += 1
+            self.discard(connection)
+
+    def open_connection(self):
+        """
+        Opens a new connection for a slot already counted as open.
+        """
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.created += 1
+        return connection
+
+    def record_wait(self, seconds: float):
+        """
+        Adds a wait for a free connection, the lock being held.
+        """
+        self.waits += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def release(self, connection):
+        """
+        Takes a lent connection back, closing it beyond size idle ones.
+        """
+        try:
+            connection.rollback()
+        except Exception:
+            self.discard(connection)
+            return
+        with self._condition:
+            self._in_use -= 1
+            if len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+                return
+        self.discard(connection, lent=False)
+
+    def discard(self, connection, lent: bool = True):
+        """
+        Closes a connection and frees its slot.
+        """
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._open -= 1
+            if lent:
+                self._in_use -= 1
+            self.closed += 1
+            self._condition.notify()
+
+    def close_all(self):
+        """
+        Closes the idle connections.
+        """
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self.discard(connection, lent=False)
+
+    def metrics(self) -> dict:
+        """
+        Returns the pool counters and gauges.
+        """
+        with self._condition:
+            return {
+                "size": self.size,
+                "overflow": self.overflow,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self.created,
+                "closed": self.closed,
+                "health_check_failures": self.health_check_failures,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds,
+                "wait_seconds_max": self.max_wait_seconds,
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Returns the process-wide pool configured by PERSONAL_DATA_DB_DRIVER
+    and PERSONAL_DATA_DB_POOL_SIZE, _POOL_OVERFLOW, _POOL_IDLE_TIMEOUT
+    and _POOL_TIMEOUT.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                DRIVERS[driver_name()],
+                size=int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", "5")),
+                overflow=int(os.getenv("PERSONAL_DATA_DB_POOL_OVERFLOW",
+                                       "10")),
+                idle_timeout=float(os.getenv(
+                    "PERSONAL_DATA_DB_POOL_IDLE_TIMEOUT", "300")),
+                timeout=float(os.getenv("PERSONAL_DATA_DB_POOL_TIMEOUT",
+                                        "30")),
+            )
+        return _pool
@@ -2,6 +2,12 @@
 """
 A module for encrypting passwords.
 """
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Tuple
 import bcrypt
 
 
@@ -19,3 +25,150 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     Checks if a hashed password was formed from the given password.
     """
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+
+class BatchStats:
+    """
+    Throughput of a batch of hashes or verifications.
+    """
+
+    def __init__(self):
+        self.items = 0
+        self.chunks = 0
+        self.started = None
+        self.seconds = 0.0
+
+    def add(self, items: int):
+        """
+        Counts one finished chunk of items.
+        """
+        self.items += items
+        self.chunks += 1
+        self.seconds = time.perf_counter() - self.started
+
+    @property
+    def items_per_second(self) -> float:
+        """
+        Returns the throughput so far.
+        """
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def report(self) -> dict:
+        """
+        Returns the figures as a dict.
+        """
+        return {
+            "items": self.items,
+            "chunks": self.chunks,
+            "seconds": round(self.seconds, 6),
+            "items_per_second": round(self.items_per_second, 1),
+        }
+
+
+def hash_chunk(passwords: List[str]) -> List[bytes]:
+    """
+    Hashes a chunk of passwords.
+    """
+    return [hash_password(password) for password in passwords]
+
+
+def verify_chunk(pairs: List[Tuple[bytes, str]]) -> List[bool]:
+    """
+    Checks a chunk of (hashed_password, password) pairs.
+    """
+    return [is_valid(hashed, password) for hashed, password in pairs]
+
+
+def chunks(items: Iterable, chunk_size: int) -> Iterator[list]:
+    """
+    Yields the items in lists of chunk_size.
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def fan_out(
+    func: Callable, items: Iterable, workers: int, chunk_size: int,
+    ordered: bool, stats: BatchStats
+) -> Iterator:
+    """
+    Applies a chunk function to the items across a process pool with at
+    most 2 * workers chunks in flight. Yields the results in input order,
+    or as (index, result) pairs in completion order when not ordered.
+    """
+    if stats is None:
+        stats = BatchStats()
+    stats.started = time.perf_counter()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        offset = 0
+        for chunk in chunks(items, chunk_size):
+            results = func(chunk)
+            stats.add(len(chunk))
+            if ordered:
+                yield from results
+            else:
+                yield from enumerate(results, offset)
+            offset += len(chunk)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque() if ordered else set()
+        offsets = {}
+        offset = 0
+        source = chunks(items, chunk_size)
+        while True:
+            for chunk in source:
+                future = executor.submit(func, chunk)
+                offsets[future] = offset
+                offset += len(chunk)
+                if ordered:
+                    pending.append(future)
+                else:
+                    pending.add(future)
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results = future.result()
+                stats.add(len(results))
+                start = offsets.pop(future)
+                if ordered:
+                    yield from results
+                else:
+                    yield from enumerate(results, start)
+
+
+def hash_passwords(
+    passwords: Iterable[str], workers: int = None, chunk_size: int = 64,
+    ordered: bool = True, stats: BatchStats = None
+) -> Iterator:
+    """
+    Hashes many passwords across workers processes (all CPUs by
+    default). Yields the hashes in input order, or (index, hash) pairs
+    as they complete when not ordered. Only a bounded number of chunks
+    is read ahead, so passwords may be a stream of any length.
+    """
+    return fan_out(hash_chunk, passwords, workers, chunk_size, ordered,
+                   stats)
+
+
+def verify_many(
+    pairs: Iterable[Tuple[bytes, str]], workers: int = None,
+    chunk_size: int = 64, ordered: bool = True, stats: BatchStats = None
+) -> Iterator:
+    """
+    Checks many (hashed_password, password) pairs like hash_passwords.
+    """
+    return fan_out(verify_chunk, pairs, workers, chunk_size, ordered,
+                   stats)
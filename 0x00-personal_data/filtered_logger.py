@@ -2,11 +2,24 @@
 """
 Filtering logs
 """
+import argparse
+import atexit
+import json
 import os
+import queue
 import re
-from typing import List
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, List, Optional, Pattern, TextIO, Tuple
 import logging
-import mysql.connector
+from logging.handlers import QueueHandler, QueueListener
+from db_pool import get_pool, placeholder, PooledConnection
+from pii_detector import PIIDetector
 
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
@@ -18,75 +31,512 @@ def filter_datum(
     """
     Log line filtering
     """
-    for field in fields:
-        message = re.sub(
-            f"{field}=[^{separator}]*", f"{field}={redaction}", message
-        )
-    return message
+    pattern = redaction_pattern(tuple(fields), separator)
+    return pattern.sub(redaction_template(redaction), message)
+
+
+@lru_cache(maxsize=128)
+def redaction_pattern(fields: Tuple[str, ...], separator: str) -> Pattern:
+    """
+    Compiles the pattern matching the value of every field in a single
+    pass. It starts with the literal "=" so that the scan jumps from one
+    "=" to the next, then checks the field names with lookbehinds.
+    Field names and separator characters are escaped.
+    """
+    if not fields:
+        return re.compile("(?!)")
+    names = "|".join(f"(?<={re.escape(field)}=)" for field in fields)
+    value = f"[^{re.escape(separator)}]*" if separator else ".*"
+    return re.compile(f"=(?:{names}){value}")
+
+
+def redaction_template(redaction: str) -> str:
+    """
+    Returns the replacement template writing redaction as the value.
+    """
+    return "=" + redaction.replace("\\", r"\\")
+
+
+def redact_many(
+    fields: List[str], redaction: str, messages: Iterable[str],
+    separator: str
+) -> List[str]:
+    """
+    Filters many log lines with a single compiled pattern.
+    """
+    sub = redaction_pattern(tuple(fields), separator).sub
+    template = redaction_template(redaction)
+    return [sub(template, message) for message in messages]
 
 
 class RedactingFormatter(logging.Formatter):
     """
     Redacting Formatter class
+
+    Records carrying their data as a mapping, either as the logging
+    arguments (logger.info("email=%(email)s;", row)) or as
+    extra={"data": row}, are redacted field by field before formatting,
+    which also covers fields interpolated without a "field=" prefix.
+    Every formatted record then goes through the regex, which catches
+    "field=value" text in the message template or in the values of the
+    other keys. An optional PIIDetector also redacts the
+    emails, phone numbers and SSNs found in the free text of messages
+    and exceptions.
     """
 
     REDACTION = "***"
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
 
-    def __init__(self, fields: List[str]):
+    def __init__(self, fields: List[str], separator: str = ";",
+                 detector: PIIDetector = None):
         super().__init__(self.FORMAT)
         self.fields = fields
-        self.pattern = re.compile(f'({"|".join(fields)})=[^;]*')
+        self.detector = detector
+        self.separator = separator
+        self.field_set = frozenset(fields)
+        self.pattern = redaction_pattern(tuple(fields), separator)
+        self.template = redaction_template(self.REDACTION)
 
     def format(self, record: logging.LogRecord) -> str:
         """
         Formats the log recoard and redacts sensitive information.
         """
-        message = super().format(record)
-        return self.pattern.sub(r"\1=" + self.REDACTION, message)
+        data = getattr(record, "data", None)
+        if not isinstance(record.args, Mapping) and not isinstance(
+            data, Mapping
+        ):
+            return self.pattern.sub(self.template, super().format(record))
+        msg, args = record.msg, record.args
+        if isinstance(args, Mapping):
+            record.args = self.redact(args)
+        else:
+            pairs = f"{self.separator} ".join(
+                f"{key}={value}" for key, value in self.redact(data).items()
+            )
+            record.msg = f"{msg} {pairs}" if msg else pairs
+            record.args = None
+        try:
+            return self.pattern.sub(self.template, super().format(record))
+        finally:
+            record.msg, record.args = msg, args
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        """
+        Formats the message, redacting the PII found by the detector.
+        """
+        if self.detector is not None:
+            record.message = self.detector.redact(record.message)
+        return super().formatMessage(record)
+
+    def formatException(self, ei) -> str:
+        """
+        Formats an exception, redacting the PII found by the detector.
+        """
+        text = super().formatException(ei)
+        if self.detector is not None:
+            text = self.detector.redact(text)
+        return text
+
+    def redact(self, data: Mapping) -> dict:
+        """
+        Returns a copy of data with the values of the fields redacted.
+        """
+        redacted = dict(data)
+        for key in self.field_set.intersection(redacted):
+            redacted[key] = self.REDACTION
+        return redacted
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler putting records on a bounded queue. When the queue is
+    full the overflow policy either blocks the caller ("block"), drops
+    the oldest queued record ("drop_oldest") or keeps one overflowing
+    record out of sample_every and drops the others ("sample").
+    """
+
+    POLICIES = ("block", "drop_oldest", "sample")
+
+    def __init__(self, log_queue: queue.Queue, overflow: str = "block",
+                 sample_every: int = 10):
+        if overflow not in self.POLICIES:
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.sample_every = max(1, sample_every)
+        self.enqueued = 0
+        self.dropped = 0
+        self.overflowed = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Leaves formatting to the listener thread. Mapping data is copied
+        so that the caller may reuse it.
+        """
+        if isinstance(record.args, Mapping):
+            record.args = dict(record.args)
+        data = getattr(record, "data", None)
+        if isinstance(data, Mapping):
+            record.data = dict(data)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        """
+        Puts a record on the queue, applying the overflow policy.
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.overflowed += 1
+                keep = self.overflow == "block" or (
+                    self.overflow == "sample"
+                    and self.overflowed % self.sample_every == 0
+                )
+            if keep:
+                self.queue.put(record)
+            elif self.overflow == "drop_oldest":
+                self.drop_oldest(record)
+                return
+            else:
+                with self._lock:
+                    self.dropped += 1
+                return
+        with self._lock:
+            self.enqueued += 1
+
+    def drop_oldest(self, record: logging.LogRecord):
+        """
+        Makes room for a record by dropping the oldest queued ones.
+        """
+        while True:
+            try:
+                self.queue.get_nowait()
+                with self._lock:
+                    self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                break
+            except queue.Full:
+                continue
+        with self._lock:
+            self.enqueued += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the queue counters.
+        """
+        with self._lock:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "overflowed": self.overflowed,
+                "queued": self.queue.qsize(),
+            }
 
 
-def get_logger() -> logging.Logger:
+class BatchingStreamHandler(logging.StreamHandler):
+    """
+    StreamHandler buffering formatted records and writing them in one
+    call when flushed or when max_batch records are buffered.
+    """
+
+    def __init__(self, stream=None, max_batch: int = 512):
+        super().__init__(stream)
+        self.max_batch = max_batch
+        self.buffer = []
+
+    def emit(self, record: logging.LogRecord):
+        """
+        Buffers one formatted record.
+        """
+        try:
+            self.buffer.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= self.max_batch:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records.
+        """
+        self.acquire()
+        try:
+            if self.buffer:
+                lines, self.buffer = self.buffer, []
+                self.stream.write("".join(lines))
+            super().flush()
+        finally:
+            self.release()
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    QueueListener flushing its handlers whenever the queue is drained.
+    """
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        """
+        Flushes the handlers before waiting on an empty queue.
+        """
+        if block and self.queue.empty():
+            self.flush()
+        return super().dequeue(block)
+
+    def flush(self):
+        """
+        Flushes every handler.
+        """
+        for handler in self.handlers:
+            handler.flush()
+
+    def enqueue_sentinel(self):
+        """
+        Waits for room on the bounded queue to enqueue the stop sentinel.
+        """
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        """
+        Stops the thread once the queue is processed, then flushes.
+        """
+        if self._thread is not None:
+            super().stop()
+            self.flush()
+
+
+def get_logger(async_mode: bool = None, queue_size: int = None,
+               overflow: str = None) -> logging.Logger:
     """
     Returns a logging.Logger object.
+
+    In async mode (LOG_ASYNC=1) records go through a bounded queue of
+    queue_size records (LOG_QUEUE_SIZE) and are redacted and written in
+    batches by a listener thread; overflow (LOG_OVERFLOW) is the policy
+    of BoundedQueueHandler, LOG_SAMPLE_EVERY its sampling rate.
+    LOG_PII_DETECTOR=1 adds a PIIDetector to the formatter.
+    Calling it again returns the configured logger unchanged.
     """
     logger = logging.getLogger("user_data")
+    if logger.handlers:
+        return logger
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    handler = logging.StreamHandler()
-    handler.setFormatter(RedactingFormatter(PII_FIELDS))
+    if async_mode is None:
+        async_mode = os.getenv("LOG_ASYNC", "0") == "1"
+    detector = None
+    if os.getenv("LOG_PII_DETECTOR", "0") == "1":
+        detector = PIIDetector()
+    formatter = RedactingFormatter(PII_FIELDS, detector=detector)
+    if not async_mode:
+        handler = logging.StreamHandler()
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+        return logger
+
+    if queue_size is None:
+        queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    if overflow is None:
+        overflow = os.getenv("LOG_OVERFLOW", "block")
+    stream_handler = BatchingStreamHandler()
+    stream_handler.setFormatter(formatter)
+    handler = BoundedQueueHandler(
+        queue.Queue(queue_size), overflow,
+        int(os.getenv("LOG_SAMPLE_EVERY", "10"))
+    )
+    handler.listener = BatchingQueueListener(
+        handler.queue, stream_handler, respect_handler_level=True
+    )
+    handler.listener.start()
+    atexit.register(handler.listener.stop)
     logger.addHandler(handler)
     return logger
 
 
-def get_db() -> mysql.connector.connection.MySQLConnection:
+def get_db() -> PooledConnection:
     """
-    Returns a connector to the database.
+    Returns a connector to the database, borrowed from the pool of the
+    PERSONAL_DATA_DB_DRIVER driver; closing it gives it back.
     """
-    connection = mysql.connector.connect(
-        host=os.getenv("PERSONAL_DATA_DB_HOST", "localhost"),
-        user=os.getenv("PERSONAL_DATA_DB_USERNAME", "root"),
-        password=os.getenv("PERSONAL_DATA_DB_PASSWORD", ""),
-        database=os.getenv("PERSONAL_DATA_DB_NAME", ""),
-    )
-    return connection
+    return get_pool().acquire()
+
+
+IDENTIFIER = re.compile(r"^\w+$")
 
 
-def main():
+def redact_batch(
+    columns: List[str], rows: List[tuple], output_format: str
+) -> str:
     """
-    Main function
+    Returns the redacted lines of a batch of rows, either as NDJSON or
+    formatted as the "user_data" log.
     """
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM users;")
-    logger = get_logger()
-    for row in cursor:
-        message = "; ".join(
-            f"{field}={value}" for field, value in zip(PII_FIELDS, row)
+    if output_format == "ndjson":
+        pii = frozenset(PII_FIELDS)
+        return "".join(
+            json.dumps({
+                column: RedactingFormatter.REDACTION if column in pii
+                else value for column, value in zip(columns, row)
+            }, default=str) + "\n"
+            for row in rows
         )
-        logger.info(message)
-    cursor.close()
-    db.close()
+    formatter = RedactingFormatter(PII_FIELDS)
+    lines = []
+    for row in rows:
+        record = logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                                   "", None, None)
+        record.data = dict(zip(columns, row))
+        lines.append(formatter.format(record) + "\n")
+    return "".join(lines)
+
+
+def read_checkpoint(path: str) -> Optional[dict]:
+    """
+    Returns the saved checkpoint, None when there is none.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path: str, checkpoint: dict):
+    """
+    Atomically replaces the checkpoint file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def export(
+    db, output: TextIO, table: str = "users", key: str = None,
+    output_format: str = "log", batch_size: int = 1000, workers: int = 0,
+    checkpoint_path: str = None, placeholder: str = "%s",
+    progress: TextIO = None
+) -> int:
+    """
+    Streams the rows of a table from any DB-API connection and writes
+    them redacted to output, returning the number of rows exported.
+
+    Rows are fetched in batch_size batches and redacted by workers
+    processes (inline when 0). Ordered by the unique key column, the
+    export saves the last written key to checkpoint_path after every
+    batch and resumes after it on the next run (keyset pagination).
+    placeholder is the parameter marker of the driver ("?" for sqlite3).
+    """
+    for name in (table, key):
+        if name is not None and not IDENTIFIER.match(name):
+            raise ValueError(f"invalid identifier: {name}")
+    if checkpoint_path and not key:
+        raise ValueError("a checkpoint requires a key column")
+    checkpoint = read_checkpoint(checkpoint_path) if checkpoint_path \
+        else None
+    if checkpoint and checkpoint.get("key") != key:
+        raise ValueError(f"checkpoint is for key {checkpoint.get('key')}")
+
+    query, params = f"SELECT * FROM {table}", ()
+    if checkpoint:
+        query += f" WHERE {key} > {placeholder}"
+        params = (checkpoint["last"],)
+    if key:
+        query += f" ORDER BY {key}"
+    cursor = db.cursor()
+    cursor.execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    key_index = columns.index(key) if key else None
+    exported = checkpoint["rows"] if checkpoint else 0
+    start = time.monotonic()
+
+    def batches():
+        """
+        Yields the fetched batches of rows.
+        """
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+    def write(rows: List[tuple], lines: str):
+        """
+        Writes a redacted batch, then saves the checkpoint.
+        """
+        nonlocal exported
+        output.write(lines)
+        output.flush()
+        exported += len(rows)
+        if checkpoint_path:
+            write_checkpoint(checkpoint_path, {
+                "key": key, "last": rows[-1][key_index], "rows": exported,
+            })
+        if progress is not None:
+            elapsed = time.monotonic() - start
+            progress.write("{} rows, {:.0f} rows/s\n".format(
+                exported, exported / elapsed if elapsed else 0.0))
+
+    try:
+        if workers <= 0:
+            for rows in batches():
+                write(rows, redact_batch(columns, rows, output_format))
+            return exported
+        with ProcessPoolExecutor(workers) as executor:
+            pending = deque()
+            for rows in batches():
+                pending.append((rows, executor.submit(
+                    redact_batch, columns, rows, output_format)))
+                if len(pending) >= 2 * workers:
+                    rows, future = pending.popleft()
+                    write(rows, future.result())
+            while pending:
+                rows, future = pending.popleft()
+                write(rows, future.result())
+        return exported
+    finally:
+        cursor.close()
+
+
+def main(argv: List[str] = None):
+    """
+    Main function: exports the users table redacted.
+    """
+    parser = argparse.ArgumentParser(
+        description="Export the users table with its PII redacted"
+    )
+    parser.add_argument("--format", choices=("log", "ndjson"),
+                        default="log")
+    parser.add_argument("--output", help="output file, stdout by default")
+    parser.add_argument("--table", default="users")
+    parser.add_argument("--key", help="unique column ordering the export")
+    parser.add_argument("--checkpoint",
+                        help="resume file, requires --key")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="redaction processes, 0 to redact inline")
+    parser.add_argument("--progress", action="store_true",
+                        help="report progress on stderr")
+    args = parser.parse_args(argv)
+
+    db = get_db()
+    resume = args.checkpoint and read_checkpoint(args.checkpoint)
+    output = sys.stdout
+    if args.output:
+        output = open(args.output, "a" if resume else "w")
+    try:
+        export(db, output, args.table, args.key, args.format,
+               args.batch_size, args.workers, args.checkpoint,
+               placeholder(), progress=sys.stderr if args.progress else None)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        db.close()
 
 
 if __name__ == "__main__":
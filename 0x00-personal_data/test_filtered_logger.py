@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Tests of the redacted export, with SQLite standing in for MySQL
+"""
+import io
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, export
+
+
+ROWS = 250
+BATCH_SIZE = 20
+
+
+class CrashingOutput(io.StringIO):
+    """
+    Output failing on the write after the first `writes` ones
+    """
+
+    def __init__(self, writes: int):
+        super().__init__()
+        self.writes = writes
+
+    def write(self, text: str) -> int:
+        """
+        Writes text, or raises once the budget of writes is spent.
+        """
+        if self.writes == 0:
+            raise RuntimeError("simulated crash")
+        self.writes -= 1
+        return super().write(text)
+
+
+class TestExport(unittest.TestCase):
+    """
+    Export of a users table to redacted NDJSON and log lines
+    """
+
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+            "email TEXT, phone TEXT, ssn TEXT, password TEXT, ip TEXT, "
+            "last_login TEXT, user_agent TEXT)"
+        )
+        self.db.executemany(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(i, f"name{i}", f"user{i}@example.com", f"555-{i:04d}",
+              f"123-45-{i:04d}", f"secret{i}", f"10.0.0.{i % 256}",
+              "2019-11-14 06:14:24", "agent")
+             for i in range(1, ROWS + 1)]
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.directory.name, "export.json")
+
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+
+    def run_export(self, output, **kwargs) -> int:
+        """
+        Exports the users table by id in NDJSON.
+        """
+        return export(self.db, output, key="id", output_format="ndjson",
+                      batch_size=BATCH_SIZE, placeholder="?", **kwargs)
+
+    def test_ndjson_is_redacted(self):
+        """
+        Every row is exported, with its PII fields redacted.
+        """
+        output = io.StringIO()
+        self.assertEqual(self.run_export(output), ROWS)
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([row["id"] for row in rows],
+                         list(range(1, ROWS + 1)))
+        for field in ("name", "email", "phone", "ssn", "password"):
+            self.assertEqual({row[field] for row in rows}, {"***"})
+        self.assertEqual(rows[0]["ip"], "10.0.0.1")
+
+    def test_workers_keep_the_order(self):
+        """
+        Redacting in worker processes writes the same output.
+        """
+        inline, parallel = io.StringIO(), io.StringIO()
+        self.run_export(inline)
+        self.assertEqual(self.run_export(parallel, workers=2), ROWS)
+        self.assertEqual(parallel.getvalue(), inline.getvalue())
+
+    def test_log_format_is_redacted(self):
+        """
+        The log lines hold no PII value.
+        """
+        output = io.StringIO()
+        export(self.db, output, batch_size=BATCH_SIZE, placeholder="?")
+        text = output.getvalue()
+        self.assertEqual(len(text.splitlines()), ROWS)
+        self.assertNotIn("user1@example.com", text)
+        self.assertNotIn("secret1", text)
+        self.assertIn("name=***; email=***; phone=***;", text)
+        self.assertIn("; ip=10.0.0.1; ", text)
+
+    def test_resume_after_crash(self):
+        """
+        A run crashing after some batches resumes after the last written
+        one, and the two runs export every row exactly once.
+        """
+        crashed = CrashingOutput(writes=3)
+        with self.assertRaises(RuntimeError):
+            self.run_export(crashed, checkpoint_path=self.checkpoint)
+        with open(self.checkpoint) as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint["rows"], 3 * BATCH_SIZE)
+        self.assertEqual(checkpoint["last"], 3 * BATCH_SIZE)
+
+        resumed = io.StringIO()
+        total = self.run_export(resumed, checkpoint_path=self.checkpoint)
+        self.assertEqual(total, ROWS)
+        lines = (crashed.getvalue() + resumed.getvalue()).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines],
+                         list(range(1, ROWS + 1)))
+
+        expected = io.StringIO()
+        self.run_export(expected)
+        self.assertEqual(crashed.getvalue() + resumed.getvalue(),
+                         expected.getvalue())
+
+    def test_resume_when_done_exports_nothing(self):
+        """
+        Resuming a finished export writes no row.
+        """
+        self.run_export(io.StringIO(), checkpoint_path=self.checkpoint)
+        output = io.StringIO()
+        total = self.run_export(output, checkpoint_path=self.checkpoint)
+        self.assertEqual(total, ROWS)
+        self.assertEqual(output.getvalue(), "")
+
+
+class TestRedactingFormatter(unittest.TestCase):
+    """
+    Redaction of records carrying their data as a mapping
+    """
+
+    def setUp(self):
+        self.formatter = RedactingFormatter(fields=PII_FIELDS)
+
+    def format(self, msg, args=None, **extra) -> str:
+        """
+        Formats a record of msg % args with the attributes of extra.
+        """
+        record = logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                                   msg, args, None)
+        record.__dict__.update(extra)
+        return self.formatter.format(record)
+
+    def test_mapping_args_with_field_in_template(self):
+        """
+        A "field=" in the template is redacted even when its value comes
+        from a key that is not a PII field.
+        """
+        text = self.format("user %(name)s logged in with password=%(pw)s;",
+                           ({"name": "bob", "pw": "hunter2"},))
+        self.assertNotIn("bob", text)
+        self.assertNotIn("hunter2", text)
+        self.assertIn("password=***;", text)
+
+    def test_data_value_holding_field(self):
+        """
+        A PII "field=value" inside the value of another key is redacted.
+        """
+        text = self.format("login", data={"note": "email=bob@example.com;",
+                                          "ip": "10.0.0.1"})
+        self.assertNotIn("bob@example.com", text)
+        self.assertIn("ip=10.0.0.1", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
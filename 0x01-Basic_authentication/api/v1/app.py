@@ -16,6 +16,9 @@ CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 
 auth = None
 AUTH_TYPE = getenv('AUTH_TYPE')
+# /api/v1/metrics exposes per-stage auth timings, so it requires
+# authentication unless METRICS_PUBLIC is set (e.g. for a local scraper)
+METRICS_PUBLIC = getenv("METRICS_PUBLIC", "0").lower() in ("1", "true", "yes")
 
 if AUTH_TYPE == "auth":
     from api.v1.auth.auth import Auth
@@ -41,6 +44,8 @@ def before_request_func():
         "/api/v1/unauthorized/",
         "/api/v1/forbidden/"
     ]
+    if METRICS_PUBLIC:
+        excluded_paths.append("/api/v1/metrics/")
     if not auth.require_auth(
         request.path, excluded_paths
     ):
@@ -3,6 +3,7 @@
 BasicAuth module for the API
 """
 from api.v1.auth.auth import Auth
+from models.metrics import span
 from models.user import User
 from base64 import b64decode
 from typing import TypeVar
@@ -77,13 +78,16 @@ class BasicAuth(Auth):
         if user_pwd is None or not isinstance(user_pwd, str):
             return None
         try:
-            users = User.search({
-                "email": user_email
-            })
+            with span("user_search"):
+                users = User.search({
+                    "email": user_email
+                })
         except Exception:
             return None
         for user in users:
-            if user.is_valid_password(user_pwd):
+            with span("password_hash"):
+                valid = user.is_valid_password(user_pwd)
+            if valid:
                 return user
         return None
 
@@ -91,10 +95,18 @@ class BasicAuth(Auth):
         """
         Method to retrieve the User instance for a request
         """
-        header = self.authorization_header(request)
-        base64_header = self.extract_base64_authorization_header(header)
-        decoded_header = self.decode_base64_authorization_header(base64_header)
-        user_email, user_pwd = self.extract_user_credentials(decoded_header)
+        with span("header"):
+            header = self.authorization_header(request)
+        with span("extract_base64"):
+            base64_header = self.extract_base64_authorization_header(header)
+        with span("decode_base64"):
+            decoded_header = self.decode_base64_authorization_header(
+                base64_header
+            )
+        with span("credentials"):
+            user_email, user_pwd = self.extract_user_credentials(
+                decoded_header
+            )
         return self.user_object_from_credentials(
             user_email, user_pwd
         )
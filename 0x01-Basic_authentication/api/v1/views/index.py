@@ -2,7 +2,7 @@
 """
 Module of Index views
 """
-from flask import jsonify, abort
+from flask import jsonify, abort, Response
 from api.v1.views import app_views
 
 
@@ -28,6 +28,16 @@ def stats() -> str:
     return jsonify(stats)
 
 
+@app_views.route('/metrics', methods=['GET'], strict_slashes=False)
+def metrics() -> str:
+    """ GET /api/v1/metrics
+    Return:
+      - the auth and storage stage timings in Prometheus text format
+    """
+    from models import metrics
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app_views.route('/unauthorized', methods=['GET'], strict_slashes=False)
 def unauthorized() -> str:
     """
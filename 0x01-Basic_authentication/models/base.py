@@ -4,6 +4,7 @@
 from datetime import datetime
 from typing import TypeVar, List, Iterable
 from os import path
+from models.metrics import span
 import json
 import uuid
 
@@ -67,7 +68,7 @@ class Base():
         if not path.exists(file_path):
             return
 
-        with open(file_path, 'r') as f:
+        with span("storage_load"), open(file_path, 'r') as f:
             objs_json = json.load(f)
             for obj_id, obj_json in objs_json.items():
                 DATA[s_class][obj_id] = cls(**obj_json)
@@ -78,28 +79,31 @@ class Base():
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        with span("storage_write"):
+            objs_json = {}
+            for obj_id, obj in DATA[s_class].items():
+                objs_json[obj_id] = obj.to_json(True)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+            with open(file_path, 'w') as f:
+                json.dump(objs_json, f)
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with span("storage_save"):
+            self.updated_at = datetime.utcnow()
+            DATA[s_class][self.id] = self
+            self.__class__.save_to_file()
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            with span("storage_remove"):
+                del DATA[s_class][self.id]
+                self.__class__.save_to_file()
 
     @classmethod
     def count(cls) -> int:
@@ -119,7 +123,8 @@ class Base():
         """ Return one object by ID
         """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        with span("storage_get"):
+            return DATA[s_class].get(id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
@@ -133,5 +138,6 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        with span("storage_search"):
+            return list(filter(_search, DATA[s_class].values()))
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""
+Version 1 of the API
+IMPORT_STARTED is the time the package started loading, so that the
+startup profile of api.v1.app also counts its module-level imports
+(Flask, the JSON provider, compression).
+"""
+from time import perf_counter
+
+
+IMPORT_STARTED = perf_counter()
@@ -3,50 +3,171 @@
 Route module for the API
 """
 from os import getenv
-from api.v1.views import app_views
-from flask import Flask, jsonify, abort, request
-from flask_cors import (CORS, cross_origin)
-
-
-app = Flask(__name__)
-app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
-app.register_blueprint(app_views)
-CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
-
-
-auth = None
-AUTH_TYPE = getenv('AUTH_TYPE')
-
-if AUTH_TYPE == "auth":
-    from api.v1.auth.auth import Auth
-
-    auth = Auth()
-elif AUTH_TYPE == "basic_auth":
-    from api.v1.auth.basic_auth import BasicAuth
+from concurrent.futures import ThreadPoolExecutor
+from api.v1 import IMPORT_STARTED
+from api.v1.auth.composite_auth import CompositeAuth
+from api.v1.compression import middleware_from_env
+from api.v1.json_provider import jsonify
+from flask import Flask, abort, request, current_app
+from importlib import import_module
+from time import perf_counter
+import json
+import sys
+
+
+# Seconds spent importing this module and its dependencies, counted from
+# the first import of the api.v1 package
+MODULE_IMPORTS = perf_counter() - IMPORT_STARTED
+
+AUTH_CLASSES = {
+    "auth": ("api.v1.auth.auth", "Auth"),
+    "basic_auth": ("api.v1.auth.basic_auth", "BasicAuth"),
+    "session_auth": ("api.v1.auth.session_auth", "SessionAuth"),
+    "session_exp_auth": ("api.v1.auth.session_exp_auth", "SessionExpAuth"),
+    "session_db_auth": ("api.v1.auth.session_db_auth", "SessionDBAuth"),
+}
+STORES = ("models.user.User", "models.user_session.UserSession")
+
+
+def default_config() -> dict:
+    """
+    Returns the application configuration read from the environment
+    """
+    return {
+        "AUTH_TYPE": getenv("AUTH_TYPE"),
+        "JSONIFY_PRETTYPRINT_REGULAR": False,
+        "STORES": STORES,
+        "WARM_UP": getenv("WARM_UP", "1") != "0",
+        "PARALLEL_WARM_UP": getenv("PARALLEL_WARM_UP", "0") == "1",
+        # /api/v1/metrics exposes per-stage auth timings, so it requires
+        # authentication unless METRICS_PUBLIC is set
+        "METRICS_PUBLIC": getenv("METRICS_PUBLIC", "0").lower() in (
+            "1", "true", "yes"
+        ),
+    }
+
+
+def load_auth(auth_type: str):
+    """
+    Builds the authenticator named by AUTH_TYPE.
+    A comma separated list, e.g. "session_auth,basic_auth", builds a
+    CompositeAuth trying each scheme cheapest first.
+    Raises ValueError on an unknown name, rather than leaving the API
+    unprotected because of a typo.
+    """
+    if not auth_type:
+        return None
+    auths = []
+    for name in auth_type.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in AUTH_CLASSES:
+            raise ValueError("Unknown AUTH_TYPE {!r}, expected one of {}"
+                             .format(name, ", ".join(sorted(AUTH_CLASSES))))
+        module_name, class_name = AUTH_CLASSES[name]
+        module = import_module(module_name)
+        auths.append((name, getattr(module, class_name)()))
+    if not auths:
+        return None
+    if len(auths) == 1:
+        return auths[0][1]
+    return CompositeAuth(auths)
+
+
+def load_store(store: str, from_file: bool = True):
+    """
+    Loads the objects of one "module.Class" store into memory
+    """
+    module_name, class_name = store.rsplit(".", 1)
+    cls = getattr(import_module(module_name), class_name)
+    if from_file:
+        cls.load_from_file()
+    else:
+        from models.base import DATA
 
-    auth = BasicAuth()
-elif AUTH_TYPE == "session_auth":
-    from api.v1.auth.session_auth import SessionAuth
+        DATA.setdefault(cls.__name__, {})
+    return cls
 
-    auth = SessionAuth()
-elif AUTH_TYPE == "session_exp_auth":
-    from api.v1.auth.session_exp_auth import SessionExpAuth
 
-    auth = SessionExpAuth()
+def warm_up(stores, parallel: bool = False, from_file: bool = True):
+    """
+    Loads every store, optionally in parallel threads
+    """
+    if not parallel or len(stores) < 2:
+        return [load_store(store, from_file) for store in stores]
+    with ThreadPoolExecutor(max_workers=len(stores)) as executor:
+        return list(executor.map(
+            lambda store: load_store(store, from_file), stores
+        ))
 
-elif AUTH_TYPE == "session_db_auth":
-    from api.v1.auth.session_db_auth import SessionDBAuth
 
-    auth = SessionDBAuth()
+def create_app(config: dict = None, timings: dict = None) -> Flask:
+    """
+    Application factory.
+    Every key of config overrides default_config(); the seconds spent
+    in each startup phase are stored in timings when given.
+    """
+    settings = default_config()
+    settings.update(config or {})
+    if timings is None:
+        timings = {}
+
+    start = perf_counter()
+    from flask_cors import CORS
+    from api.v1.views import app_views
+    timings["imports"] = MODULE_IMPORTS + perf_counter() - start
+
+    start = perf_counter()
+    app = Flask(__name__)
+    app.config.update(settings)
+    app.register_blueprint(app_views)
+    CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
+    app.before_request(before_request)
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(401, unauthorized_error)
+    app.register_error_handler(403, forbidden_error)
+    compression = middleware_from_env(app.wsgi_app)
+    if compression is not None:
+        app.wsgi_app = compression
+        app.extensions["compression"] = compression.stats
+    timings["blueprints"] = perf_counter() - start
+
+    start = perf_counter()
+    app.extensions["auth"] = load_auth(settings["AUTH_TYPE"])
+    timings["auth"] = perf_counter() - start
+
+    start = perf_counter()
+    warm_up(
+        settings["STORES"], settings["PARALLEL_WARM_UP"], settings["WARM_UP"]
+    )
+    timings["store_load"] = perf_counter() - start
+
+    return app
+
+
+def __getattr__(name: str):
+    """
+    Builds the default application the first time api.v1.app.app or
+    api.v1.app.auth is used, so importing this module stays cheap
+    """
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    if name == "auth":
+        return __getattr__("app").extensions["auth"]
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name)
+    )
 
 
-@app.before_request
 def before_request() -> str:
     """
     This function is executed before each request to the API.
     It checks if the request requires authentication and
     validates the request accordingly.
     """
+    auth = current_app.extensions.get("auth")
     if auth is None:
         return
     excluded_paths = [
@@ -55,11 +176,17 @@ def before_request() -> str:
         "/api/v1/forbidden/",
         "/api/v1/auth_session/login/"
     ]
+    if current_app.config.get("METRICS_PUBLIC"):
+        excluded_paths.append("/api/v1/metrics/")
     if not auth.require_auth(
         request.path, excluded_paths
     ):
         return
-    if (
+    if isinstance(auth, CompositeAuth):
+        # Several schemes: credentials of any of them will do
+        if not auth.has_credentials(request):
+            abort(401)
+    elif (
         auth.authorization_header(
             request
         ) is None and auth.session_cookie(
@@ -75,7 +202,6 @@ def before_request() -> str:
     request.current_user = current_user
 
 
-@app.errorhandler(404)
 def not_found(error) -> str:
     """
     Error handler for 404 error.
@@ -84,7 +210,6 @@ def not_found(error) -> str:
     return jsonify({"error": "Not found"}), 404
 
 
-@app.errorhandler(401)
 def unauthorized_error(error) -> str:
     """
     Error handler for 401 error.
@@ -95,7 +220,6 @@ def unauthorized_error(error) -> str:
     }), 401
 
 
-@app.errorhandler(403)
 def forbidden_error(error) -> str:
     """
     Error handler for 403 error.
@@ -109,4 +233,13 @@ def forbidden_error(error) -> str:
 if __name__ == "__main__":
     host = getenv("API_HOST", "0.0.0.0")
     port = getenv("API_PORT", "5000")
+    timings = {}
+    app = create_app(timings=timings)
+    if "--profile-startup" in sys.argv[1:]:
+        timings["total"] = sum(timings.values())
+        print(json.dumps({
+            phase: round(seconds * 1000, 3)
+            for phase, seconds in timings.items()
+        }, indent=2), file=sys.stderr)
+        sys.exit(0)
     app.run(host=host, port=port)
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for the API.
+a2wsgi runs each request of the Flask application in a pool of
+ASGI_WORKERS threads, so the event loop keeps serving other connections
+while a request waits on file storage or password hashing. The number
+of requests handled at once is bounded by that pool, not by the number
+of open keep-alive connections: beyond ASGI_WORKERS, requests queue.
+Serve it with any ASGI server, e.g.
+    uvicorn api.v1.asgi:application
+"""
+from a2wsgi import WSGIMiddleware
+from api.v1.app import create_app
+from os import getenv
+
+
+try:
+    ASGI_WORKERS = int(getenv("ASGI_WORKERS", "32"))
+except ValueError:
+    ASGI_WORKERS = 32
+
+application = WSGIMiddleware(create_app(), workers=ASGI_WORKERS)
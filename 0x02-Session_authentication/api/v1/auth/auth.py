@@ -12,6 +12,8 @@ class Auth:
     This class does manage the API Auth
     """
 
+    cost = 0
+
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """
         Method to require auth
@@ -39,6 +41,12 @@ class Auth:
             return None
         return request.headers.get('Authorization')
 
+    def has_credentials(self, request=None) -> bool:
+        """
+        Tells whether the request carries credentials for this scheme
+        """
+        return self.authorization_header(request) is not None
+
     def current_user(self, request=None) -> TypeVar('User'):
         """
         Method to handle current user
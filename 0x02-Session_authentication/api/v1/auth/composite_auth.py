@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+CompositeAuth module chaining several authentication schemes
+"""
+from api.v1.auth.auth import Auth
+from typing import List, Tuple, TypeVar
+
+
+class CompositeAuth(Auth):
+    """
+    Composite Authentication class that tries each configured
+    authenticator, cheapest first, until one recognizes the user
+    """
+
+    def __init__(self, auths: List[Tuple[str, Auth]]):
+        """
+        Initialize a CompositeAuth instance from (name, authenticator)
+        pairs
+        """
+        self.auths = sorted(auths, key=lambda item: item[1].cost)
+        self.cost = self.auths[0][1].cost if self.auths else 0
+
+    def has_credentials(self, request=None) -> bool:
+        """
+        Tells whether the request carries credentials for any scheme
+        """
+        return any(auth.has_credentials(request) for _, auth in self.auths)
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """
+        Returns the User matched by the first authenticator that accepts
+        the request, and records its name on request.auth_type
+        """
+        for name, auth in self.auths:
+            if not auth.has_credentials(request):
+                continue
+            user = auth.current_user(request)
+            if user is not None:
+                if request is not None:
+                    request.auth_type = name
+                return user
+        return None
+
+    def session_auth(self) -> Auth:
+        """
+        Returns the first authenticator able to manage sessions
+        """
+        for _, auth in self.auths:
+            if hasattr(auth, "create_session"):
+                return auth
+        return None
+
+    def create_session(self, user_id: str = None) -> str:
+        """
+        Creates a Session ID through the session authenticator
+        """
+        auth = self.session_auth()
+        if auth is None:
+            return None
+        return auth.create_session(user_id)
+
+    def destroy_session(self, request=None):
+        """
+        Deletes the user session through the session authenticator
+        """
+        auth = self.session_auth()
+        if auth is None:
+            return False
+        return auth.destroy_session(request)
@@ -3,6 +3,7 @@
 Session Auth module
 """
 from api.v1.auth.auth import Auth
+from models.metrics import span
 from models.user import User
 import uuid
 
@@ -12,6 +13,7 @@ class SessionAuth(Auth):
     Session Authentication class that inherits from Auth
     """
 
+    cost = 1
     user_id_by_session_id = {}
 
     def create_session(self, user_id: str = None) -> str:
@@ -38,18 +40,27 @@ class SessionAuth(Auth):
 
         return self.user_id_by_session_id.get(session_id)
 
+    def has_credentials(self, request=None) -> bool:
+        """
+        Tells whether the request carries a session cookie
+        """
+        return self.session_cookie(request) is not None
+
     def current_user(self, request=None) -> [User]:
         """
         Returns a User instance based on a cookie value
         """
-        session_id = self.session_cookie(request)
+        with span("session_cookie"):
+            session_id = self.session_cookie(request)
 
         if session_id is None:
             return None
 
-        user_id = self.user_id_for_session_id(session_id)
+        with span("session_lookup"):
+            user_id = self.user_id_for_session_id(session_id)
 
-        return User.get(user_id)
+        with span("user_get"):
+            return User.get(user_id)
 
     def destroy_session(self, request=None):
         """
@@ -12,6 +12,8 @@ class SessionDBAuth(SessionExpAuth):
     SessionDBAuth class that inherits from SessionExpAuth
     """
 
+    cost = 5
+
     def create_session(self, user_id=None):
         """
         Create a Session ID and store it in the database.
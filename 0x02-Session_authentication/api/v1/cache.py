@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Response cache module for the hot read endpoints of the API
+"""
+from collections import OrderedDict
+from flask import make_response, request, Response
+from functools import wraps
+from models.base import subscribe
+from os import getenv
+from threading import Lock
+from typing import Callable, Optional, Tuple
+
+
+CLASS_WIDE = "*"
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized responses bounded by their total size.
+    Every entry is tagged with (class name, object id), or
+    (class name, CLASS_WIDE) when it depends on all objects of a class,
+    and the tags in use are indexed by class name.
+    Each invalidation bumps the generation of its class, so that a
+    response rendered before a change is never stored after it.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Initialize an empty cache holding at most max_bytes of bodies
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._classes = {}
+        self._generations = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Returns the (body, etag) cached under key, None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def generation(self, s_class: str) -> int:
+        """
+        Returns the number of invalidations of a class, to be read before
+        rendering a response and handed to put
+        """
+        with self._lock:
+            return self._generations.get(s_class, 0)
+
+    def put(self, key: str, body: bytes, etag: str, tag: Tuple[str, str],
+            generation: int):
+        """
+        Caches a response body, evicting the least recently used entries.
+        The body is dropped when the class of tag was invalidated since
+        generation was read.
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(tag[0], 0) != generation:
+                return
+            self._discard(key)
+            self._entries[key] = (body, etag, tag)
+            self._tags.setdefault(tag, set()).add(key)
+            self._classes.setdefault(tag[0], set()).add(tag)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, s_class: str, obj_id: str = None):
+        """
+        Drops the entries affected by a change of one object, or of the
+        whole class when obj_id is None
+        """
+        with self._lock:
+            self._generations[s_class] = \
+                self._generations.get(s_class, 0) + 1
+            if obj_id is None:
+                tags = list(self._classes.get(s_class, ()))
+            else:
+                tags = [(s_class, CLASS_WIDE), (s_class, obj_id)]
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def _discard(self, key: str):
+        """
+        Removes one entry, the lock being held
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry[0])
+        keys = self._tags.get(entry[2])
+        keys.discard(key)
+        if not keys:
+            del self._tags[entry[2]]
+            tags = self._classes[entry[2][0]]
+            tags.discard(entry[2])
+            if not tags:
+                del self._classes[entry[2][0]]
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def render(self) -> str:
+        """
+        Renders the counters in the Prometheus text format
+        """
+        lines = []
+        for name, value in self.stats().items():
+            kind = "counter" if name in (
+                "hits", "misses", "evictions", "invalidations"
+            ) else "gauge"
+            if kind == "counter":
+                name += "_total"
+            lines.append("# TYPE response_cache_{} {}".format(name, kind))
+            lines.append("response_cache_{} {}".format(name, value))
+        return "\n".join(lines) + "\n"
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """
+    Builds the cache sized by RESPONSE_CACHE_BYTES, None when it is 0
+    """
+    try:
+        max_bytes = int(getenv("RESPONSE_CACHE_BYTES", str(8 * 1024 * 1024)))
+    except ValueError:
+        max_bytes = 8 * 1024 * 1024
+    if max_bytes <= 0:
+        return None
+    return ResponseCache(max_bytes)
+
+
+CACHE = cache_from_env()
+if CACHE is not None:
+    subscribe(CACHE.invalidate)
+
+
+def cached(s_class: str, id_arg: str = None) -> Callable:
+    """
+    Decorator caching the 200 responses of a GET view.
+    The entry depends on the object whose id is the id_arg view argument,
+    or on every object of s_class when id_arg is None.
+    """
+    def decorator(view: Callable) -> Callable:
+        """
+        Wraps the view
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            """
+            Serves the view from the cache when possible
+            """
+            obj_id = kwargs.get(id_arg, CLASS_WIDE) if id_arg else CLASS_WIDE
+            if CACHE is None or obj_id in (None, "me"):
+                return view(*args, **kwargs)
+
+            key = request.full_path
+            entry = CACHE.get(key)
+            if entry is not None:
+                body, etag = entry
+                if etag is not None and \
+                        request.if_none_match.contains_weak(etag):
+                    response = Response(status=304)
+                else:
+                    response = Response(body, mimetype="application/json")
+                if etag is not None:
+                    response.set_etag(etag)
+                return response
+
+            generation = CACHE.generation(s_class)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                CACHE.put(
+                    key, response.get_data(), response.get_etag()[0],
+                    (s_class, obj_id), generation
+                )
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Response compression middleware for the API
+"""
+from os import getenv
+from threading import Lock
+from typing import Callable, Iterable, List, Optional, Tuple
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Returns the preferred supported encoding of an Accept-Encoding
+    header ("br" or "gzip"), None when the client accepts neither
+    """
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name == "*":
+            for encoding in supported:
+                weights.setdefault(encoding, weight)
+        elif name in supported:
+            weights[name] = weight
+    best = None
+    for encoding in supported:
+        if weights.get(encoding, 0) > 0 and (
+            best is None or weights[encoding] > weights[best]
+        ):
+            best = encoding
+    return best
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    Returns the entity tag of the encoded representation of a response,
+    "abc" becoming "abc-gzip": a strong tag must change with the bytes
+    """
+    if etag.endswith('"'):
+        return etag[:-1] + "-" + encoding + '"'
+    return etag
+
+
+def decode_if_none_match(header: str, encoding: str) -> Tuple[str, bool]:
+    """
+    Strips the encoding suffix from the tags of an If-None-Match header,
+    so that the application compares its own tags. The W/ prefix, which
+    proxies add when they alter a body, is dropped as well: If-None-Match
+    uses the weak comparison. Returns the header and whether any tag had
+    the suffix
+    """
+    suffix = "-" + encoding + '"'
+    tags = []
+    found = False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.endswith(suffix):
+            tag = tag[:-len(suffix)] + '"'
+            found = True
+        tags.append(tag)
+    return ", ".join(tags), found
+
+
+def with_encoded_etag(headers: List[Tuple[str, str]],
+                      encoding: str) -> List[Tuple[str, str]]:
+    """
+    Returns the headers with the ETag of the encoded representation
+    """
+    return [
+        (name, encoded_etag(value, encoding))
+        if name.lower() == "etag" else (name, value)
+        for name, value in headers
+    ]
+
+
+class CompressionStats:
+    """
+    Totals of compressed responses, bytes and CPU time per encoding
+    """
+
+    def __init__(self):
+        """
+        Initialize empty totals
+        """
+        self.totals = {}
+        self.skipped = 0
+        self._lock = Lock()
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int,
+               cpu_seconds: float):
+        """
+        Adds the figures of one compressed response
+        """
+        with self._lock:
+            total = self.totals.setdefault(encoding, [0, 0, 0, 0.0])
+            total[0] += 1
+            total[1] += bytes_in
+            total[2] += bytes_out
+            total[3] += cpu_seconds
+
+    def skip(self):
+        """
+        Counts one response sent uncompressed
+        """
+        with self._lock:
+            self.skipped += 1
+
+    def render(self) -> str:
+        """
+        Renders the totals in the Prometheus text format
+        """
+        lines = [
+            "# TYPE compression_skipped_total counter",
+            "compression_skipped_total {}".format(self.skipped),
+        ]
+        names = ("responses_total", "bytes_in_total", "bytes_out_total",
+                 "cpu_seconds_total")
+        with self._lock:
+            totals = {key: list(value) for key, value in self.totals.items()}
+        for index, name in enumerate(names):
+            lines.append("# TYPE compression_{} counter".format(name))
+            for encoding, total in sorted(totals.items()):
+                lines.append('compression_{}{{encoding="{}"}} {}'.format(
+                    name, encoding, total[index]))
+        return "\n".join(lines) + "\n"
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware compressing compressible responses with gzip or
+    brotli. Streamed bodies are compressed chunk by chunk.
+    Compressed responses get a per-encoding ETag (see encoded_etag),
+    which is stripped again from If-None-Match before the application
+    compares it.
+    """
+
+    def __init__(self, app: Callable, min_size: int = 1024,
+                 level: int = 6, brotli_quality: int = 4,
+                 stats: CompressionStats = None):
+        """
+        Initialize the middleware around a WSGI application
+        """
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.stats = stats if stats is not None else CompressionStats()
+
+    def __call__(self, environ: dict, start_response: Callable):
+        """
+        Runs the application and compresses its response when useful
+        """
+        encoding = None
+        if environ.get("REQUEST_METHOD") != "HEAD":
+            encoding = negotiate(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return self.app(environ, start_response)
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        revalidating = False
+        if if_none_match:
+            environ["HTTP_IF_NONE_MATCH"], revalidating = \
+                decode_if_none_match(if_none_match, encoding)
+
+        captured = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            """
+            Delays start_response until the encoding is decided
+            """
+            captured["status"] = status
+            captured["headers"] = headers
+            captured["exc_info"] = exc_info
+            return written.append
+
+        app_iter = self.app(environ, capture)
+        chunks = iter(app_iter)
+        buffered = []
+        exhausted = False
+        if "status" not in captured:
+            # generators only call start_response once iterated
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buffered.append(chunk)
+        buffered[:0] = written
+        size = sum(len(chunk) for chunk in buffered)
+        length = self.content_length(captured["headers"])
+        if self.compressible(captured["status"], captured["headers"]):
+            while size < self.min_size and not exhausted:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                buffered.append(chunk)
+                size += len(chunk)
+            if length is not None and size >= length:
+                exhausted = True
+
+        headers = captured["headers"]
+        if size < self.min_size or not self.compressible(
+            captured["status"], headers
+        ):
+            self.stats.skip()
+            if revalidating and captured["status"][:3] == "304":
+                headers = with_encoded_etag(headers, encoding)
+            start_response(captured["status"], headers, captured["exc_info"])
+            return self.passthrough(buffered, chunks, app_iter)
+
+        headers = [
+            (name, value)
+            for name, value in with_encoded_etag(headers, encoding)
+            if name.lower() not in ("content-length", "vary")
+        ]
+        vary = [value for name, value in captured["headers"]
+                if name.lower() == "vary"]
+        vary.append("Accept-Encoding")
+        headers.append(("Content-Encoding", encoding))
+        headers.append(("Vary", ", ".join(vary)))
+
+        if exhausted:
+            close = getattr(app_iter, "close", None)
+            if close is not None:
+                close()
+            body = b"".join(buffered)
+            start = time.thread_time()
+            compressor = self.compressor(encoding)
+            data = compressor[0](body) + compressor[1]()
+            self.stats.record(encoding, len(body), len(data),
+                              time.thread_time() - start)
+            headers.append(("Content-Length", str(len(data))))
+            start_response(captured["status"], headers, captured["exc_info"])
+            return [data]
+
+        start_response(captured["status"], headers, captured["exc_info"])
+        return self.stream(encoding, buffered, chunks, app_iter)
+
+    @staticmethod
+    def content_length(headers: List[Tuple[str, str]]) -> Optional[int]:
+        """
+        Returns the Content-Length of a response, None when unknown
+        """
+        for name, value in headers:
+            if name.lower() == "content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    def compressible(status: str, headers: List[Tuple[str, str]]) -> bool:
+        """
+        Tells whether a response may be compressed
+        """
+        if status[:3] in ("204", "206", "304"):
+            return False
+        content_type = ""
+        for name, value in headers:
+            name = name.lower()
+            if name == "content-encoding":
+                return False
+            if name == "content-type":
+                content_type = value.lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def compressor(self, encoding: str) -> Tuple[Callable, Callable]:
+        """
+        Returns (compress, finish) callables of a new compressor
+        """
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.finish
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress, compressor.flush
+
+    def stream(self, encoding: str, buffered: list, chunks: Iterable,
+               app_iter: Iterable):
+        """
+        Yields the compressed body of a streamed response
+        """
+        compress, finish = self.compressor(encoding)
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+        try:
+            for source in (buffered, chunks):
+                for chunk in source:
+                    start = time.thread_time()
+                    data = compress(chunk)
+                    cpu += time.thread_time() - start
+                    bytes_in += len(chunk)
+                    if data:
+                        bytes_out += len(data)
+                        yield data
+            start = time.thread_time()
+            data = finish()
+            cpu += time.thread_time() - start
+            bytes_out += len(data)
+            yield data
+        finally:
+            self.stats.record(encoding, bytes_in, bytes_out, cpu)
+            close = getattr(app_iter, "close", None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def passthrough(buffered: list, chunks: Iterable, app_iter: Iterable):
+        """
+        Yields an uncompressed body
+        """
+        try:
+            for chunk in buffered:
+                yield chunk
+            for chunk in chunks:
+                yield chunk
+        finally:
+            close = getattr(app_iter, "close", None)
+            if close is not None:
+                close()
+
+
+def middleware_from_env(app: Callable) -> Optional[CompressionMiddleware]:
+    """
+    Wraps a WSGI application as configured by the COMPRESS_* environment
+    variables, None when COMPRESS_MIN_SIZE is negative
+    """
+    try:
+        min_size = int(getenv("COMPRESS_MIN_SIZE", "1024"))
+        level = int(getenv("COMPRESS_LEVEL", "6"))
+        quality = int(getenv("COMPRESS_BROTLI_QUALITY", "4"))
+    except ValueError:
+        min_size, level, quality = 1024, 6, 4
+    if min_size < 0:
+        return None
+    return CompressionMiddleware(app, min_size, level, quality)
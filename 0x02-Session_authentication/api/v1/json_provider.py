@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+JSON provider module for the API
+"""
+from flask import current_app, request, Response
+from os import getenv
+from typing import Callable, Dict, Tuple
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_compact(obj) -> bytes:
+    """
+    Serializes obj with the standard library, without whitespace
+    """
+    return json.dumps(
+        obj, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+def _json_pretty(obj) -> bytes:
+    """
+    Serializes obj with the standard library, indented
+    """
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+PROVIDERS: Dict[str, Tuple[Callable, Callable]] = {
+    "json": (_json_compact, _json_pretty),
+}
+
+if orjson is not None:
+    PROVIDERS["orjson"] = (
+        orjson.dumps,
+        lambda obj: orjson.dumps(obj, option=orjson.OPT_INDENT_2),
+    )
+
+
+def get_provider(name: str = None) -> Tuple[Callable, Callable]:
+    """
+    Returns the (compact, pretty) serializers of a provider.
+    "auto" picks the fastest one installed.
+    """
+    if name is None:
+        name = getenv("JSON_PROVIDER", "auto")
+    if name == "auto":
+        name = "orjson" if "orjson" in PROVIDERS else "json"
+    return PROVIDERS.get(name, PROVIDERS["json"])
+
+
+_compact, _pretty = get_provider()
+
+
+def set_provider(name: str):
+    """
+    Selects the provider used by jsonify
+    """
+    global _compact, _pretty
+    _compact, _pretty = get_provider(name)
+
+
+def dumps(obj, pretty: bool = False) -> bytes:
+    """
+    Serializes obj to UTF-8 JSON bytes
+    """
+    if pretty:
+        return _pretty(obj)
+    return _compact(obj)
+
+
+def wants_pretty() -> bool:
+    """
+    Tells whether the current request asked for indented JSON,
+    with ?pretty=1 or the JSONIFY_PRETTYPRINT_REGULAR setting
+    """
+    if request.args.get("pretty", "0") not in ("", "0", "false"):
+        return True
+    return bool(current_app.config.get("JSONIFY_PRETTYPRINT_REGULAR"))
+
+
+def jsonify(*args, **kwargs) -> Response:
+    """
+    Drop-in replacement of flask.jsonify using the selected provider.
+    Output is compact unless the request asked for pretty printing.
+    """
+    if args and kwargs:
+        raise TypeError("jsonify() takes args or kwargs, not both")
+    if len(args) == 1:
+        data = args[0]
+    else:
+        data = list(args) or kwargs
+    body = dumps(data, wants_pretty())
+    if not body.endswith(b"\n"):
+        body += b"\n"
+    return Response(body, mimetype="application/json")
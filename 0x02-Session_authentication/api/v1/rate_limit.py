@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limiter throttling login attempts before any password
+hashing takes place
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from math import ceil
+from os import getenv
+from typing import Optional, Tuple
+
+
+# Defaults of the LOGIN_RATE_LIMIT_* variables: 5 attempts per email and
+# 50 failed attempts per IP address per minute. The IP budget is larger
+# because many users can share an address behind NAT or a proxy.
+DEFAULT_BURST = 5
+DEFAULT_IP_BURST = 50
+DEFAULT_PERIOD = 60
+DEFAULT_MAX_KEYS = 10000
+
+
+class MemoryBackend:
+    """
+    Token buckets in a bounded, process-local LRU mapping
+    """
+
+    def __init__(self, max_keys: int = 10000) -> None:
+        """
+        Initialize the backend, evicting the least recently used bucket
+        beyond max_keys buckets
+        """
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(
+        self, key: str, capacity: float, rate: float, now: float
+    ) -> float:
+        """
+        Takes one token from the bucket of key, refilled with rate tokens
+        per second up to capacity; now is the monotonic time.
+        Returns 0 when a token was taken, otherwise the seconds until the
+        next token
+        """
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def refund(self, key: str, capacity: float) -> None:
+        """
+        Gives back one token to the bucket of key, up to capacity
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                tokens, stamp = bucket
+                self._buckets[key] = (min(capacity, tokens + 1), stamp)
+
+    def reset(self, key: str) -> None:
+        """
+        Forgets the bucket of key
+        """
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SQLiteBackend:
+    """
+    Token buckets in a SQLite file, shared by every worker process
+    of the host
+    """
+
+    def __init__(self, path: str, max_keys: int = 10000) -> None:
+        """
+        Initialize the backend on the SQLite file at path, evicting the
+        least recently used buckets beyond max_keys buckets
+        """
+        self.path = path
+        self.max_keys = max_keys
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL, stamp REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_buckets_stamp "
+                "ON buckets (stamp)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns the SQLite connection of the current thread
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(
+        self, key: str, capacity: float, rate: float, now: float
+    ) -> float:
+        """
+        Takes one token from the bucket of key, refilled with rate tokens
+        per second up to capacity; now is the wall-clock time.
+        Returns 0 when a token was taken, otherwise the seconds until the
+        next token
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, stamp FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, stamp = row if row is not None else (capacity, now)
+            tokens = min(capacity, tokens + max(0, now - stamp) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            if row is None:
+                conn.execute(
+                    "DELETE FROM buckets WHERE key IN ("
+                    "SELECT key FROM buckets ORDER BY stamp DESC "
+                    "LIMIT -1 OFFSET ?)", (self.max_keys,)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def refund(self, key: str, capacity: float) -> None:
+        """
+        Gives back one token to the bucket of key, up to capacity
+        """
+        self._connection().execute(
+            "UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?",
+            (capacity, key)
+        )
+
+    def reset(self, key: str) -> None:
+        """
+        Forgets the bucket of key
+        """
+        self._connection().execute(
+            "DELETE FROM buckets WHERE key = ?", (key,)
+        )
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter keyed by client IP address and by email.
+    Every attempt takes a token from both buckets. A successful login
+    gives the IP token back and clears the email bucket, so only failed
+    attempts count against an address shared by many users
+    """
+
+    def __init__(
+        self, capacity: float = DEFAULT_BURST, period: float = DEFAULT_PERIOD,
+        backend=None, clock=None, ip_capacity: float = DEFAULT_IP_BURST
+    ) -> None:
+        """
+        Initialize the limiter allowing bursts of capacity attempts per
+        email and of ip_capacity failed attempts per IP address, both
+        refilled in period seconds.
+        backend defaults to a MemoryBackend and clock to the clock that
+        fits the backend
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.ip_capacity = ip_capacity
+        self.ip_rate = ip_capacity / period
+        self.backend = backend if backend is not None else MemoryBackend()
+        if clock is None:
+            clock = time.time if isinstance(
+                self.backend, SQLiteBackend
+            ) else time.monotonic
+        self.clock = clock
+
+    def hit(
+        self, ip: Optional[str], email: Optional[str]
+    ) -> Tuple[bool, int]:
+        """
+        Records a login attempt of the client IP for the email.
+        Returns whether it is allowed and, if not, the seconds to send in
+        the Retry-After header
+        """
+        now = self.clock()
+        wait = 0.0
+        buckets = (
+            (ip, f"ip:{ip}", self.ip_capacity, self.ip_rate),
+            (email, f"email:{email}", self.capacity, self.rate),
+        )
+        for value, key, capacity, rate in buckets:
+            if value is None:
+                continue
+            wait = max(wait, self.backend.take(key, capacity, rate, now))
+        if wait > 0:
+            return False, max(1, ceil(wait))
+        return True, 0
+
+    def succeeded(self, ip: Optional[str], email: str) -> None:
+        """
+        Records a successful login: refunds the token the attempt took
+        from the IP bucket and clears the email bucket
+        """
+        if ip is not None:
+            self.backend.refund(f"ip:{ip}", self.ip_capacity)
+        self.reset(email)
+
+    def reset(self, email: str) -> None:
+        """
+        Clears the bucket of email
+        """
+        self.backend.reset(f"email:{email}")
+
+
+def limiter_from_env() -> Optional[RateLimiter]:
+    """
+    Builds the login limiter from the LOGIN_RATE_LIMIT_* environment
+    variables, None when LOGIN_RATE_LIMIT_BURST,
+    LOGIN_RATE_LIMIT_IP_BURST or LOGIN_RATE_LIMIT_PERIOD is 0
+    """
+    try:
+        capacity = float(getenv("LOGIN_RATE_LIMIT_BURST", DEFAULT_BURST))
+        ip_capacity = float(
+            getenv("LOGIN_RATE_LIMIT_IP_BURST", DEFAULT_IP_BURST)
+        )
+        period = float(getenv("LOGIN_RATE_LIMIT_PERIOD", DEFAULT_PERIOD))
+        max_keys = int(
+            getenv("LOGIN_RATE_LIMIT_MAX_KEYS", DEFAULT_MAX_KEYS)
+        )
+    except ValueError:
+        capacity, ip_capacity = DEFAULT_BURST, DEFAULT_IP_BURST
+        period, max_keys = DEFAULT_PERIOD, DEFAULT_MAX_KEYS
+    if capacity <= 0 or ip_capacity <= 0 or period <= 0:
+        return None
+
+    backend_path = getenv("LOGIN_RATE_LIMIT_SQLITE")
+    if backend_path:
+        backend = SQLiteBackend(backend_path, max_keys)
+    else:
+        backend = MemoryBackend(max_keys)
+    return RateLimiter(capacity, period, backend, ip_capacity=ip_capacity)
@@ -2,7 +2,9 @@
 """
 Module of Index views
 """
-from flask import jsonify, abort
+from flask import abort, current_app, Response
+from api.v1.cache import cached
+from api.v1.json_provider import jsonify
 from api.v1.views import app_views
 
 
@@ -17,6 +19,7 @@ def status() -> str:
 
 
 @app_views.route('/stats/', strict_slashes=False)
+@cached("User")
 def stats() -> str:
     """ GET /api/v1/stats
     Return:
@@ -28,6 +31,24 @@ def stats() -> str:
     return jsonify(stats)
 
 
+@app_views.route('/metrics', methods=['GET'], strict_slashes=False)
+def metrics() -> str:
+    """ GET /api/v1/metrics
+    Return:
+      - the auth and storage stage timings, the response cache and
+        the compression counters in Prometheus text format
+    """
+    from api.v1.cache import CACHE
+    from models import metrics
+    body = metrics.render()
+    if CACHE is not None:
+        body += CACHE.render()
+    compression = current_app.extensions.get("compression")
+    if compression is not None:
+        body += compression.render()
+    return Response(body, content_type=metrics.CONTENT_TYPE)
+
+
 @app_views.route('/unauthorized', methods=['GET'], strict_slashes=False)
 def unauthorized() -> str:
     """
@@ -2,12 +2,17 @@
 """
 A Module of Session Authentication views
 """
+from api.v1.json_provider import jsonify
+from api.v1.rate_limit import limiter_from_env
 from api.v1.views import app_views
-from flask import request, abort, jsonify, request
+from flask import request, abort, request, current_app
 from models.user import User
 from os import getenv
 
 
+LOGIN_LIMITER = limiter_from_env()
+
+
 @app_views.route('/auth_session/login', methods=['POST'], strict_slashes=False)
 def login():
     """
@@ -25,6 +30,13 @@ def login():
     if not password:
         return jsonify({"error": "password missing"}), 400
 
+    if LOGIN_LIMITER is not None:
+        allowed, retry_after = LOGIN_LIMITER.hit(request.remote_addr, email)
+        if not allowed:
+            response = jsonify({"error": "too many login attempts"})
+            response.headers["Retry-After"] = str(retry_after)
+            return response, 429
+
     try:
         found_users = User.search({'email': email})
     except Exception:
@@ -37,7 +49,10 @@ def login():
         if not user.is_valid_password(password):
             return jsonify({"error": "wrong password"}), 401
 
-    from api.v1.app import auth
+    auth = current_app.extensions["auth"]
+
+    if LOGIN_LIMITER is not None:
+        LOGIN_LIMITER.succeeded(request.remote_addr, email)
 
     user = found_users[0]
     session_id = auth.create_session(user.id)
@@ -60,7 +75,7 @@ def logout():
     Return:
         - Empty dictionary if successful
     """
-    from api.v1.app import auth
+    auth = current_app.extensions["auth"]
 
     deleted = auth.destroy_session(request)
 
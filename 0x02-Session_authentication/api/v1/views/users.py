@@ -1,22 +1,56 @@
 #!/usr/bin/env python3
 """ Module of Users views
 """
+from api.v1.cache import cached
+from api.v1.json_provider import jsonify, wants_pretty
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import abort, request, Response
 from models.user import User
 
 
+def representation_etag(etag: str) -> str:
+    """ Entity tag of the representation sent for a resource entity tag
+    """
+    if wants_pretty():
+        return etag + "-pretty"
+    return etag
+
+
+def not_modified(etag: str) -> Response:
+    """ 304 response when the client already has the given entity tag,
+    None otherwise
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    """ Set the ETag header of a response
+    """
+    response.set_etag(etag)
+    return response
+
+
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
+@cached("User")
 def view_all_users() -> str:
     """ GET /api/v1/users
     Return:
       - list of all User objects JSON represented
     """
+    etag = representation_etag(User.collection_etag())
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
     all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    return with_etag(jsonify(all_users), etag)
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
+@cached("User", id_arg="user_id")
 def view_one_user(user_id: str = None) -> str:
     """ GET /api/v1/users/:id
     Path parameter:
@@ -32,13 +66,17 @@ def view_one_user(user_id: str = None) -> str:
         abort(404)
 
     if user_id == "me" and request.current_user is not None:
-        return jsonify(request.current_user.to_json())
-
-    user = User.get(user_id)
+        user = request.current_user
+    else:
+        user = User.get(user_id)
     if user is None:
         abort(404)
 
-    return jsonify(user.to_json())
+    etag = representation_etag(user.etag())
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+    return with_etag(jsonify(user.to_json()), etag)
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+""" Benchmark of the WSGI and the ASGI entry points of the API
+Usage: ./bench_asgi.py --wsgi URL --asgi URL --email E --password P
+                       [--concurrency 50] [--requests 5000] [--login]
+Start both servers on the same file storage with a session auth type,
+for instance:
+    export AUTH_TYPE=session_auth SESSION_NAME=_my_session_id
+    export LOGIN_RATE_LIMIT_BURST=0
+    API_PORT=5000 python3 -m api.v1.app              # WSGI
+    uvicorn api.v1.asgi:application --port 8000      # ASGI
+The user given by --email and --password must exist in the storage.
+Each client logs in, keeps one keep-alive connection open and repeatedly
+requests GET /api/v1/users/me (or POST /api/v1/auth_session/login with
+--login). Requests/s and latency percentiles of each server are printed
+as JSON.
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from typing import List
+from urllib.parse import urlencode, urlsplit
+
+LOGIN_PATH = "/api/v1/auth_session/login"
+PROFILE_PATH = "/api/v1/users/me"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """ Return the given percentile of sorted samples, 0 without samples
+    """
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str,
+            form: dict = None, cookie: str = None) -> http.client.HTTPResponse:
+    """ Send one request on a keep-alive connection and read the response
+    """
+    headers = {}
+    body = None
+    if form is not None:
+        body = urlencode(form)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    if cookie is not None:
+        headers["Cookie"] = cookie
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response
+
+
+def session_cookie(response: http.client.HTTPResponse) -> str:
+    """ Return the "name=value" session cookie set by a login response,
+    None if the login failed
+    """
+    cookie = response.getheader("Set-Cookie", "")
+    if "=" not in cookie:
+        return None
+    return cookie.split(";", 1)[0]
+
+
+def run(url: str, credentials: dict, concurrency: int, total: int,
+        login: bool) -> dict:
+    """ Drive one server and return its throughput and latency figures
+    """
+    parts = urlsplit(url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_client = max(1, total // concurrency)
+    barrier = threading.Barrier(concurrency + 1)
+
+    def client():
+        """ Log in and run the requests of one client
+        """
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+        try:
+            cookie = session_cookie(
+                request(conn, "POST", LOGIN_PATH, credentials)
+            )
+        except (OSError, http.client.HTTPException):
+            cookie = None
+        samples = []
+        failed = 0
+        barrier.wait()
+        for _ in range(per_client):
+            start = time.perf_counter()
+            try:
+                if login:
+                    response = request(conn, "POST", LOGIN_PATH, credentials)
+                else:
+                    response = request(conn, "GET", PROFILE_PATH,
+                                       cookie=cookie)
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(
+                    parts.hostname, parts.port or 80
+                )
+            samples.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(samples)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "url": url,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def main():
+    """ Parse the command line and benchmark each given server
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wsgi", help="base URL of the WSGI server")
+    parser.add_argument("--asgi", help="base URL of the ASGI server")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--login", action="store_true",
+                        help="measure the login instead of /users/me")
+    args = parser.parse_args()
+
+    credentials = {"email": args.email, "password": args.password}
+    results = {}
+    for name in ("wsgi", "asgi"):
+        url = getattr(args, name)
+        if url:
+            results[name] = run(url, credentials, args.concurrency,
+                                args.requests, args.login)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
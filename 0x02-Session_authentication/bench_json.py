@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" Benchmark of the JSON serialization of large user lists
+Usage: ./bench_json.py [--users 10000] [--repeat 5]
+Compares the former pretty-printed stdlib output with every provider of
+api.v1.json_provider, in compact and pretty form.
+"""
+import argparse
+import json
+import time
+from api.v1 import json_provider
+from models.user import User
+
+
+def build_payload(count: int) -> list:
+    """ Build the GET /api/v1/users payload for count users
+    """
+    payload = []
+    for i in range(count):
+        user = User(email="user{}@example.com".format(i),
+                    first_name="First{}".format(i),
+                    last_name="Last{}".format(i))
+        user.password = "pwd{}".format(i)
+        payload.append(user.to_json())
+    return payload
+
+
+def measure(serialize, payload, repeat: int) -> dict:
+    """ Time serialize(payload), keeping the best of repeat runs
+    """
+    best = None
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = serialize(payload)
+        elapsed = time.perf_counter() - start
+        size = len(body)
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "bytes": size,
+        "seconds": round(best, 6),
+        "mb_per_second": round(size / best / 1e6, 1),
+        "users_per_second": round(len(payload) / best),
+    }
+
+
+def main():
+    """ Run the benchmark and print the results as JSON
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = build_payload(args.users)
+    results = {
+        "stdlib_pretty_sorted (before)": measure(
+            lambda obj: json.dumps(obj, indent=2, sort_keys=True).encode(),
+            payload, args.repeat),
+    }
+    for name in sorted(json_provider.PROVIDERS):
+        compact, pretty = json_provider.PROVIDERS[name]
+        results[name + "_compact"] = measure(compact, payload, args.repeat)
+        results[name + "_pretty"] = measure(pretty, payload, args.repeat)
+    print(json.dumps({"users": args.users, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+""" Bulk import of users into the file store
+Usage: ./import_users.py users.csv [--format csv|ndjson]
+The input has email, password, first_name and last_name fields ("-"
+reads stdin). Emails already in the store or seen earlier in the input
+are skipped. All users are written with a single save of .db_User.json.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import Iterable, Iterator, TextIO
+from models.user import User
+
+
+def read_rows(stream: TextIO, input_format: str) -> Iterator[dict]:
+    """ Yield the rows of a CSV or NDJSON stream as dicts
+    """
+    if input_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def build_users(rows: Iterable[dict], emails: set, report: dict
+                ) -> Iterator[User]:
+    """ Yield a User per valid row whose email is not in emails,
+    adding it to emails and counting the rows in report
+    """
+    for row in rows:
+        report["read"] += 1
+        email = row.get("email")
+        password = row.get("password")
+        if not email or not password:
+            report["invalid"] += 1
+            continue
+        if email in emails:
+            report["duplicates"] += 1
+            continue
+        emails.add(email)
+        user = User(email=email, first_name=row.get("first_name") or None,
+                    last_name=row.get("last_name") or None)
+        user.password = password
+        yield user
+
+
+def main():
+    """ Import the users and print the report as JSON
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="CSV or NDJSON file, - for stdin")
+    parser.add_argument("--format", choices=("csv", "ndjson"),
+                        help="guessed from the file extension by default")
+    args = parser.parse_args()
+
+    input_format = args.format or (
+        "ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv"
+    )
+    start = time.perf_counter()
+    User.load_from_file()
+    emails = {user.email for user in User.all()}
+    report = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="")
+    try:
+        users = build_users(read_rows(stream, input_format), emails, report)
+        report["imported"] = User.bulk_save(users)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["rows_per_second"] = round(
+        report["read"] / report["seconds"]) if report["seconds"] else 0
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
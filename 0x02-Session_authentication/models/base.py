@@ -2,14 +2,37 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
+from typing import TypeVar, List, Iterable, Callable, Optional
 from os import path
+from models.metrics import span
+from threading import Lock
 import json
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+GENERATIONS = {}
+GENERATIONS_LOCK = Lock()
+LISTENERS = []
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def subscribe(listener: Callable[[str, Optional[str]], None]):
+    """ Register a callable notified with (class name, object id) after
+    every change; the id is None when the whole class was reloaded
+    """
+    LISTENERS.append(listener)
+
+
+def touch(s_class: str, obj_id: str = None):
+    """ Bump the generation counter of a class after a change
+    and notify the listeners
+    """
+    with GENERATIONS_LOCK:
+        GENERATIONS[s_class] = GENERATIONS.get(s_class, 0) + 1
+    for listener in LISTENERS:
+        listener(s_class, obj_id)
 
 
 class Base():
@@ -44,6 +67,24 @@ class Base():
             return False
         return (self.id == other.id)
 
+    def etag(self) -> str:
+        """ Strong entity tag of the object, changed by every save
+        """
+        return "{}-{}".format(self.id,
+                              self.updated_at.strftime("%Y%m%d%H%M%S%f"))
+
+    @classmethod
+    def generation(cls) -> int:
+        """ Number of changes made to the objects of the class
+        """
+        return GENERATIONS.get(cls.__name__, 0)
+
+    @classmethod
+    def collection_etag(cls) -> str:
+        """ Strong entity tag of all objects of the class
+        """
+        return "{}-{}-{}".format(cls.__name__, BOOT_ID, cls.generation())
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
@@ -64,10 +105,11 @@ class Base():
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
         DATA[s_class] = {}
+        touch(s_class)
         if not path.exists(file_path):
             return
 
-        with open(file_path, 'r') as f:
+        with span("storage_load"), open(file_path, 'r') as f:
             objs_json = json.load(f)
             for obj_id, obj_json in objs_json.items():
                 DATA[s_class][obj_id] = cls(**obj_json)
@@ -78,28 +120,49 @@ class Base():
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        with span("storage_write"):
+            objs_json = {}
+            for obj_id, obj in DATA[s_class].items():
+                objs_json[obj_id] = obj.to_json(True)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+            with open(file_path, 'w') as f:
+                json.dump(objs_json, f)
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with span("storage_save"):
+            self.updated_at = datetime.utcnow()
+            DATA[s_class][self.id] = self
+            touch(s_class, self.id)
+            self.__class__.save_to_file()
+
+    @classmethod
+    def bulk_save(cls, objs: Iterable[TypeVar('Base')]) -> int:
+        """ Save many objects with a single write of the file,
+        return the number of objects saved
+        """
+        s_class = cls.__name__
+        count = 0
+        with span("storage_bulk_save"):
+            objects = DATA.setdefault(s_class, {})
+            for obj in objs:
+                objects[obj.id] = obj
+                count += 1
+            touch(s_class)
+            cls.save_to_file()
+        return count
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            with span("storage_remove"):
+                del DATA[s_class][self.id]
+                touch(s_class, self.id)
+                self.__class__.save_to_file()
 
     @classmethod
     def count(cls) -> int:
@@ -119,7 +182,8 @@ class Base():
         """ Return one object by ID
         """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        with span("storage_get"):
+            return DATA[s_class].get(id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
@@ -133,5 +197,6 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        with span("storage_search"):
+            return list(filter(_search, DATA[s_class].values()))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+""" Metrics module
+"""
+from bisect import bisect_left
+from os import getenv
+from threading import Lock
+from time import perf_counter
+
+
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+           0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_NAME = "auth_stage_duration_seconds"
+HISTOGRAMS = {}
+_enabled = getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+_lock = Lock()
+
+
+class Histogram():
+    """ Histogram of durations with fixed buckets
+    """
+
+    __slots__ = ('counts', 'sum', 'count', '_lock')
+
+    def __init__(self):
+        """ Initialize an empty Histogram
+        """
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        """ Record one duration in seconds
+        """
+        index = bisect_left(BUCKETS, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Span():
+    """ Context manager timing one stage into a Histogram
+    """
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        """ Initialize a Span
+        """
+        self.histogram = histogram
+
+    def __enter__(self):
+        """ Start the clock
+        """
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        """ Stop the clock and record the duration
+        """
+        self.histogram.observe(perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan():
+    """ Context manager doing nothing, used when metrics are disabled
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        """ Do nothing
+        """
+        return self
+
+    def __exit__(self, *exc):
+        """ Do nothing
+        """
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(stage: str):
+    """ Return a context manager timing the given stage
+    """
+    if not _enabled:
+        return _NOOP
+    histogram = HISTOGRAMS.get(stage)
+    if histogram is None:
+        with _lock:
+            histogram = HISTOGRAMS.setdefault(stage, Histogram())
+    return _Span(histogram)
+
+
+def enable(value: bool = True):
+    """ Turn the collection of metrics on or off
+    """
+    global _enabled
+    _enabled = value
+
+
+def is_enabled() -> bool:
+    """ Tell whether metrics are collected
+    """
+    return _enabled
+
+
+def reset():
+    """ Forget every recorded duration
+    """
+    with _lock:
+        HISTOGRAMS.clear()
+
+
+def render() -> str:
+    """ Render every histogram in the Prometheus text format
+    """
+    lines = [
+        "# HELP {} Time spent in each auth and storage stage.".format(
+            METRIC_NAME),
+        "# TYPE {} histogram".format(METRIC_NAME),
+    ]
+    for stage, histogram in sorted(HISTOGRAMS.items()):
+        with histogram._lock:
+            counts = list(histogram.counts)
+            total, count = histogram.sum, histogram.count
+        cumulative = 0
+        for bound, value in zip(BUCKETS, counts):
+            cumulative += value
+            lines.append('{}_bucket{{stage="{}",le="{}"}} {}'.format(
+                METRIC_NAME, stage, repr(bound), cumulative))
+        lines.append('{}_bucket{{stage="{}",le="+Inf"}} {}'.format(
+            METRIC_NAME, stage, count))
+        lines.append('{}_sum{{stage="{}"}} {}'.format(
+            METRIC_NAME, stage, repr(total)))
+        lines.append('{}_count{{stage="{}"}} {}'.format(
+            METRIC_NAME, stage, count))
+    return "\n".join(lines) + "\n"
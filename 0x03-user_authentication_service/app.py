@@ -4,8 +4,11 @@ This module defines the API routes for the authentication service.
 """
 from auth import Auth
 from flask import Flask, jsonify, request, abort, redirect
+from rate_limit import limiter_from_env
 app = Flask(__name__)
 AUTH = Auth()
+LOGIN_LIMITER = limiter_from_env()
+app.teardown_appcontext(AUTH.teardown)
 
 
 @app.route('/', methods=['GET'])
@@ -60,9 +63,19 @@ def log_in() -> str:
     except KeyError:
         abort(400)
 
+    if LOGIN_LIMITER is not None:
+        allowed, retry_after = LOGIN_LIMITER.hit(request.remote_addr, email)
+        if not allowed:
+            response = jsonify({"message": "too many login attempts"})
+            response.headers["Retry-After"] = str(retry_after)
+            return response, 429
+
     if not AUTH.valid_login(email, password):
         abort(401)
 
+    if LOGIN_LIMITER is not None:
+        LOGIN_LIMITER.succeeded(request.remote_addr, email)
+
     session_id = AUTH.create_session(email)
     response = jsonify({
         "email": email, "message": "logged in"
@@ -84,7 +97,7 @@ def log_out() -> str:
     if session_id is None:
         abort(403)
 
-    user = AUTH.get_user_from_session_id(session_id)
+    user = AUTH.get_profile_from_session_id(session_id)
 
     if user is None:
         abort(403)
@@ -103,7 +116,7 @@ def profile() -> str:
         str: The user's email in JSON format.
     """
     session_id = request.cookies.get("session_id")
-    user = AUTH.get_user_from_session_id(session_id)
+    user = AUTH.get_profile_from_session_id(session_id)
 
     if session_id is None or user is None:
         abort(403)
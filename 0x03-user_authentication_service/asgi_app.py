@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+This module defines the ASGI entry point of the authentication service.
+a2wsgi runs each request of the Flask application of app.py in a pool
+of ASGI_WORKERS threads, so the event loop keeps serving other
+connections while a request waits on the database or password hashing.
+The number of requests handled at once is bounded by that pool, not by
+the number of open keep-alive connections: beyond ASGI_WORKERS,
+requests queue. Routes and error pages are the ones of app.py. Serve it
+with any ASGI server, e.g.
+    uvicorn asgi_app:application
+"""
+from os import getenv
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+# Every worker thread has its own DB session, released when the request
+# ends (Auth.teardown), so ASGI_WORKERS should not exceed the DB
+# connection pool.
+try:
+    ASGI_WORKERS = int(getenv("ASGI_WORKERS", "16"))
+except ValueError:
+    ASGI_WORKERS = 16
+
+application = WSGIMiddleware(app, workers=ASGI_WORKERS)
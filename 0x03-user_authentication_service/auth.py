@@ -5,12 +5,20 @@ user registration, login validation, session management, and password reset.
 """
 import bcrypt
 from db import DB
+from session_cache import session_cache_from_env
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
-from typing import Union, Optional
+from typing import Iterable, Optional, Union
 from user import User
 from uuid import uuid4
 
 
+# Columns loaded for the user of a session: /profile needs the email and
+# DELETE /sessions the id.
+PROFILE_COLUMNS = ("id", "email")
+
+
 def _hash_password(password: str) -> str:
     """
     Hashes the input password with a salt using bcrypt.
@@ -41,6 +49,18 @@ class Auth:
 
     def __init__(self):
         self._db = DB()
+        self.session_cache = session_cache_from_env()
+
+    def teardown(self, exception: Optional[BaseException] = None) -> None:
+        """
+        Releases the database session of the current thread. Called when
+        a request ends (Flask app context teardown).
+
+        Args:
+            exception (Optional[BaseException]): The error that ended the
+            request, if any.
+        """
+        self._db.remove_session()
 
     def register_user(self, email: str, password: str) -> User:
         """
@@ -57,10 +77,14 @@ class Auth:
             ValueError: If a user with the given email already exists.
         """
         try:
-            self._db.find_user_by(email=email)
+            self._db.find_user_by(columns=("id",), email=email)
         except NoResultFound:
             hashed_password = _hash_password(password)
-            return self._db.add_user(email, hashed_password)
+            try:
+                return self._db.add_user(email, hashed_password)
+            except IntegrityError:
+                # registered concurrently since the lookup
+                pass
 
         raise ValueError(f'User {email} already exists')
 
@@ -76,7 +100,9 @@ class Auth:
             bool: True if the password is valid, False otherwise.
         """
         try:
-            user = self._db.find_user_by(email=email)
+            user = self._db.find_user_by(
+                columns=("hashed_password",), email=email
+            )
             return bcrypt.checkpw(password.encode(), user.hashed_password)
         except NoResultFound:
             return False
@@ -92,9 +118,10 @@ class Auth:
             Optional[str]: The session ID if the user exists, None otherwise.
         """
         try:
-            user = self._db.find_user_by(email=email)
+            user = self._db.find_user_by(columns=("id",), email=email)
             session_id = _generate_uuid()
             self._db.update_user(user.id, session_id=session_id)
+            self._forget_session(user.id)
             return session_id
         except NoResultFound:
             return None
@@ -107,14 +134,47 @@ class Auth:
             session_id (str): The session ID.
 
         Returns:
-            Optional[User]: The user if the session ID is valid, None
-            otherwise.
+            Optional[User]: The user if the session ID is valid,
+            None otherwise.
         """
+        if session_id is None:
+            return None
         try:
             return self._db.find_user_by(session_id=session_id)
         except NoResultFound:
             return None
 
+    def get_profile_from_session_id(self, session_id: str) -> Optional[Row]:
+        """
+        Retrieves only the id and email of the user of a session, through
+        the session cache when enabled. Used by /profile and
+        DELETE /sessions.
+
+        Args:
+            session_id (str): The session ID.
+
+        Returns:
+            Optional[Row]: The id and email of the user if the session ID
+            is valid, None otherwise.
+        """
+        if session_id is None:
+            return None
+        cache = self.session_cache
+        if cache is not None:
+            user = cache.get(session_id)
+            if user is not None:
+                return user
+            generation = cache.generation
+        try:
+            user = self._db.find_user_by(
+                columns=PROFILE_COLUMNS, session_id=session_id
+            )
+        except NoResultFound:
+            return None
+        if cache is not None:
+            cache.put(session_id, user, generation)
+        return user
+
     def destroy_session(self, user_id: int) -> None:
         """
         Destroys the user's session.
@@ -126,6 +186,41 @@ class Auth:
             self._db.update_user(user_id, session_id=None)
         except NoResultFound:
             pass
+        self._forget_session(user_id)
+
+    def destroy_sessions(self, user_ids: Iterable[int]) -> int:
+        """
+        Destroys the sessions of many users at once, with batched updates,
+        and drops them from the session cache.
+
+        Args:
+            user_ids (Iterable[int]): The users' IDs.
+
+        Returns:
+            int: The number of users found.
+        """
+        user_ids = list(user_ids)
+        count = self._db.update_users_bulk(
+            {"id": user_id, "session_id": None} for user_id in user_ids
+        )
+        if self.session_cache is not None:
+            if len(user_ids) > self.session_cache.max_entries:
+                self.session_cache.clear()
+            else:
+                for user_id in user_ids:
+                    self.session_cache.discard_user(user_id)
+        return count
+
+    def _forget_session(self, user_id: int) -> None:
+        """
+        Drops the cached session of a user once the database no longer
+        holds it.
+
+        Args:
+            user_id (int): The user's ID.
+        """
+        if self.session_cache is not None:
+            self.session_cache.discard_user(user_id)
 
     def get_reset_password_token(self, email: str) -> str:
         """
@@ -141,7 +236,7 @@ class Auth:
             ValueError: If the user does not exist.
         """
         try:
-            user = self._db.find_user_by(email=email)
+            user = self._db.find_user_by(columns=("id",), email=email)
             reset_token = _generate_uuid()
             self._db.update_user(user.id, reset_token=reset_token)
             return reset_token
@@ -157,12 +252,15 @@ class Auth:
             password (str): The new password.
         """
         try:
-            user = self._db.find_user_by(reset_token=reset_token)
+            user = self._db.find_user_by(
+                columns=("id",), reset_token=reset_token
+            )
             hashed_password = _hash_password(password)
             self._db.update_user(
                 user.id,
                 hashed_password=hashed_password,
                 reset_token=None
             )
+            self._forget_session(user.id)
         except NoResultFound:
             raise ValueError
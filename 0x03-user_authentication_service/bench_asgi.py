@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+This module benchmarks the WSGI and the ASGI versions of the service.
+Start both servers first, for instance:
+    export LOGIN_RATE_LIMIT_BURST=0
+    python3 app.py                               # WSGI on port 5000
+    uvicorn asgi_app:application --port 8000     # ASGI on port 8000
+then run:
+    ./bench_asgi.py --wsgi http://127.0.0.1:5000 --asgi http://127.0.0.1:8000
+Each client keeps one keep-alive connection open and repeatedly requests
+GET /profile (or POST /sessions with --login). Requests/s and latency
+percentiles of each server are printed as JSON.
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import urlencode, urlsplit
+from uuid import uuid4
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Returns the given percentile of sorted samples.
+
+    Args:
+        samples (List[float]): The sorted samples.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The percentile value, 0 when there are no samples.
+    """
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str,
+            form: dict = None, cookie: str = None) -> http.client.HTTPResponse:
+    """
+    Sends one request on a keep-alive connection and reads the response.
+
+    Args:
+        conn (HTTPConnection): The connection to use.
+        method (str): The HTTP method.
+        path (str): The request path.
+        form (dict, optional): The form fields to send.
+        cookie (str, optional): The session ID cookie to send.
+
+    Returns:
+        HTTPResponse: The fully read response.
+    """
+    headers = {}
+    body = None
+    if form is not None:
+        body = urlencode(form)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    if cookie is not None:
+        headers["Cookie"] = "session_id={}".format(cookie)
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response
+
+
+def session_cookie(response: http.client.HTTPResponse) -> str:
+    """
+    Extracts the session ID from a login response.
+
+    Args:
+        response (HTTPResponse): The login response.
+
+    Returns:
+        str: The session ID, None if the login failed.
+    """
+    cookie = response.getheader("Set-Cookie", "")
+    if "=" not in cookie:
+        return None
+    return cookie.split(";", 1)[0].split("=", 1)[1]
+
+
+def run(url: str, concurrency: int, total: int, login: bool) -> Dict:
+    """
+    Drives one server and measures it.
+
+    Args:
+        url (str): The base URL of the server.
+        concurrency (int): The number of concurrent clients.
+        total (int): The number of measured requests.
+        login (bool): Measure POST /sessions instead of GET /profile.
+
+    Returns:
+        Dict: Throughput and latency figures.
+    """
+    parts = urlsplit(url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_client = max(1, total // concurrency)
+    barrier = threading.Barrier(concurrency + 1)
+
+    def client():
+        """
+        Registers a user, logs it in and runs the requests of one client.
+        """
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+        credentials = {
+            "email": "bench-{}@example.com".format(uuid4()),
+            "password": "bench",
+        }
+        try:
+            request(conn, "POST", "/users", credentials)
+            cookie = session_cookie(
+                request(conn, "POST", "/sessions", credentials)
+            )
+        except (OSError, http.client.HTTPException):
+            cookie = None
+        samples = []
+        failed = 0
+        barrier.wait()
+        for _ in range(per_client):
+            start = time.perf_counter()
+            try:
+                if login:
+                    response = request(conn, "POST", "/sessions", credentials)
+                else:
+                    response = request(conn, "GET", "/profile", cookie=cookie)
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(
+                    parts.hostname, parts.port or 80
+                )
+            samples.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(samples)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "url": url,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def main() -> None:
+    """
+    Parses the command line and benchmarks each given server.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--wsgi", help="base URL of the WSGI server")
+    parser.add_argument("--asgi", help="base URL of the ASGI server")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--login", action="store_true",
+                        help="measure POST /sessions instead of /profile")
+    args = parser.parse_args()
+
+    results = {}
+    for name in ("wsgi", "asgi"):
+        url = getattr(args, name)
+        if url:
+            results[name] = run(
+                url, args.concurrency, args.requests, args.login
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write benchmark of the DB class.
+
+Usage: ./bench_db.py [--users 2000] [--readers 4] [--writers 2]
+                     [--duration 5]
+
+Runs the same workload on a fresh SQLite file with the former setup
+(default rollback journal, no pragmas) and with the tuned persistent
+setup (WAL and SQLITE_PRAGMAS). Every thread has its own DB instance,
+like separate worker processes: readers look users up by email and
+writers set session ids. Prints the operations per second and the
+errors of each setup as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Callable
+
+from db import DB
+
+
+def worker(db_factory: Callable[[], DB], write: bool, users: int,
+           deadline: float, counts: dict, lock: threading.Lock) -> None:
+    """
+    Runs reads or writes until the deadline and adds up the counts.
+
+    Args:
+        db_factory (Callable[[], DB]): Opens the thread's DB.
+        write (bool): Whether the thread writes.
+        users (int): The number of seeded users.
+        deadline (float): The time.monotonic() to stop at.
+        counts (dict): The shared counters.
+        lock (threading.Lock): Guards counts.
+    """
+    db = db_factory()
+    rng = random.Random()
+    done = errors = 0
+    latency = 0.0
+    while time.monotonic() < deadline:
+        index = rng.randrange(users)
+        start = time.perf_counter()
+        try:
+            if write:
+                db.update_user(index + 1, session_id=str(rng.random()))
+            else:
+                db.find_user_by(email="user{}@example.com".format(index))
+            done += 1
+            latency += time.perf_counter() - start
+        except Exception:
+            db._session.rollback()
+            errors += 1
+    kind = "writes" if write else "reads"
+    with lock:
+        counts[kind] += done
+        counts[kind + "_seconds"] += latency
+        counts["errors"] += errors
+
+
+def run(tune: bool, args: argparse.Namespace) -> dict:
+    """
+    Seeds a fresh database and runs the concurrent workload on it.
+
+    Args:
+        tune (bool): Whether to apply the tuned pragmas.
+        args (argparse.Namespace): The options.
+
+    Returns:
+        dict: The throughput figures.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "a.db")
+    url = "sqlite:///" + path
+    seed = DB(url, reset=True, tune=tune)
+    seed.add_users(
+        {"email": "user{}@example.com".format(i), "hashed_password": "x"}
+        for i in range(args.users)
+    )
+    seed._session.close()
+
+    counts = {"reads": 0, "writes": 0, "reads_seconds": 0.0,
+              "writes_seconds": 0.0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(
+            lambda: DB(url, reset=False, tune=tune), write, args.users,
+            deadline, counts, lock))
+        for write in [False] * args.readers + [True] * args.writers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "reads_per_second": round(counts["reads"] / args.duration, 1),
+        "writes_per_second": round(counts["writes"] / args.duration, 1),
+        "mean_read_ms": round(
+            1000 * counts["reads_seconds"] / max(counts["reads"], 1), 3),
+        "mean_write_ms": round(
+            1000 * counts["writes_seconds"] / max(counts["writes"], 1), 3),
+        "errors": counts["errors"],
+    }
+
+
+def main() -> None:
+    """
+    Runs both setups and prints the results as JSON.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    results = {
+        "default_journal": run(False, args),
+        "wal_tuned": run(True, args),
+    }
+    print(json.dumps({"options": vars(args), "results": results},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark of DB.find_user_by lookups.
+
+Usage: ./bench_lookup.py [--users 10000] [--lookups 20000]
+
+Compares the former implementation (a new ORM Query per call and the
+column names recomputed every time) with the cached statements of
+find_user_by, loading the whole User or only the id and email columns.
+Prints the lookups per second of each variant as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Callable
+
+from db import DB
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm.exc import NoResultFound
+from user import User
+
+
+def former_find_user_by(db: DB, **kwargs) -> User:
+    """
+    The implementation of find_user_by before column projection.
+
+    Args:
+        db (DB): The database.
+        **kwargs: The attributes to filter by.
+
+    Returns:
+        User: The found user.
+    """
+    if not kwargs:
+        raise InvalidRequestError
+    column_names = User.__table__.columns.keys()
+    for key in kwargs.keys():
+        if key not in column_names:
+            raise InvalidRequestError
+    user = db._session.query(User).filter_by(**kwargs).first()
+    if user is None:
+        raise NoResultFound
+    return user
+
+
+def measure(lookup: Callable, keys: list) -> dict:
+    """
+    Times one lookup per key.
+
+    Args:
+        lookup (Callable): Looks a user up by session id.
+        keys (list): The session ids.
+
+    Returns:
+        dict: The throughput.
+    """
+    start = time.perf_counter()
+    for key in keys:
+        lookup(key)
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 4),
+        "lookups_per_second": round(len(keys) / elapsed),
+    }
+
+
+def main() -> None:
+    """
+    Seeds a database and prints the throughput of each variant as JSON.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-lookup-"), "a.db")
+    db = DB("sqlite:///" + path, reset=True)
+    db.add_users(
+        {"email": "user{}@example.com".format(i), "hashed_password": "x" * 60,
+         "session_id": "session-{}".format(i)}
+        for i in range(args.users)
+    )
+    rng = random.Random(0)
+    keys = ["session-{}".format(rng.randrange(args.users))
+            for _ in range(args.lookups)]
+
+    variants = {
+        "former_query": lambda key: former_find_user_by(
+            db, session_id=key),
+        "cached_statement": lambda key: db.find_user_by(session_id=key),
+        "cached_projection": lambda key: db.find_user_by(
+            columns=("id", "email"), session_id=key),
+    }
+    results = {}
+    for name, lookup in variants.items():
+        db.remove_session()
+        lookup(keys[0])
+        results[name] = measure(lookup, keys)
+    print(json.dumps({"users": args.users, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,211 @@
 #!/usr/bin/env python3
 """DB module
 """
-from sqlalchemy import create_engine
+from os import getenv
+from sqlalchemy import bindparam, create_engine, event, insert, select, \
+    text, update
+from sqlalchemy.engine import Engine, make_url, Row
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Select, Update
+from typing import Dict, Iterable, List, Optional, Sequence, Set, \
+    Tuple, Union
 
 from user import Base, User
 
 
+DEFAULT_URL = "sqlite:///a.db"
+HOT_LOOKUPS = ("email", "session_id", "reset_token")
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "foreign_keys": "ON",
+}
+
+
+def sqlite_pragmas() -> dict:
+    """
+    Returns the pragmas applied to every SQLite connection, overridable
+    with AUTH_DB_<PRAGMA> environment variables.
+
+    Returns:
+        dict: The pragma values by name.
+    """
+    return {
+        name: getenv("AUTH_DB_" + name.upper(), str(value))
+        for name, value in SQLITE_PRAGMAS.items()
+    }
+
+
+def tune_sqlite(engine: Engine, pragmas: dict) -> None:
+    """
+    Applies pragmas to every new connection of a SQLite engine.
+
+    Args:
+        engine (Engine): The engine.
+        pragmas (dict): The pragma values by name.
+    """
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        """
+        Runs the PRAGMA statements on a new DB-API connection.
+        """
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+COLUMN_NAMES = frozenset(User.__table__.columns.keys())
+_LOOKUPS = {}
+_UPDATES = {}
+
+
+def lookup_statement(columns: Optional[Tuple[str, ...]],
+                     keys: Tuple[str, ...]) -> Select:
+    """
+    Returns the SELECT of the first user matching bound parameters named
+    after keys, loading the whole User or only columns. Statements are
+    built once per shape, and SQLAlchemy caches their compiled form.
+
+    Args:
+        columns (Optional[Tuple[str, ...]]): The projected columns, None
+            for the User entity.
+        keys (Tuple[str, ...]): The filtered columns.
+
+    Returns:
+        Select: The statement.
+    """
+    statement = _LOOKUPS.get((columns, keys))
+    if statement is None:
+        if columns is None:
+            statement = select(User)
+        else:
+            statement = select(*(getattr(User, name) for name in columns))
+        statement = statement.where(*(
+            getattr(User, key) == bindparam(key) for key in keys
+        )).limit(1)
+        _LOOKUPS[columns, keys] = statement
+    return statement
+
+
+def update_statement(keys: Tuple[str, ...]) -> Update:
+    """
+    Returns the UPDATE of the columns in keys for the row whose id is the
+    bound parameter "_id", built once per set of columns. It runs on the
+    table, without the ORM bookkeeping of the session.
+
+    Args:
+        keys (Tuple[str, ...]): The updated columns.
+
+    Returns:
+        Update: The statement.
+    """
+    statement = _UPDATES.get(keys)
+    if statement is None:
+        table = User.__table__
+        statement = update(table).where(
+            table.c.id == bindparam("_id")
+        ).values({key: bindparam(key) for key in keys})
+        _UPDATES[keys] = statement
+    return statement
+
+
+def pool_options(url: str) -> dict:
+    """
+    Returns the connection pool options of an engine: a QueuePool of
+    AUTH_DB_POOL_SIZE connections plus AUTH_DB_MAX_OVERFLOW, sized for
+    the server threads. SQLite connections are allowed to move between
+    threads, each being used by one session at a time.
+
+    Args:
+        url (str): The database URL.
+
+    Returns:
+        dict: The keyword arguments of create_engine.
+    """
+    database = make_url(url).database
+    if url.startswith("sqlite") and database in (None, "", ":memory:"):
+        return {}
+    options = {
+        "poolclass": QueuePool,
+        "pool_size": int(getenv("AUTH_DB_POOL_SIZE", "16")),
+        "max_overflow": int(getenv("AUTH_DB_MAX_OVERFLOW", "16")),
+        "pool_pre_ping": True,
+    }
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
 class DB:
     """DB class
     """
 
-    def __init__(self) -> None:
+    def __init__(self, url: Optional[str] = None,
+                 reset: Optional[bool] = None,
+                 tune: Optional[bool] = None) -> None:
         """Initialize a new DB instance
+
+        Args:
+            url (str): The database URL, AUTH_DB_URL or sqlite:///a.db
+                by default.
+            reset (bool): Drop the tables first, unless AUTH_DB_RESET is
+                0 (persistent mode).
+            tune (bool): Apply SQLITE_PRAGMAS to SQLite connections,
+                unless AUTH_DB_TUNE is 0.
+        """
+        url = url or getenv("AUTH_DB_URL", DEFAULT_URL)
+        if reset is None:
+            reset = getenv("AUTH_DB_RESET", "1") != "0"
+        if tune is None:
+            tune = getenv("AUTH_DB_TUNE", "1") != "0"
+        self._engine = create_engine(url, echo=False, **pool_options(url))
+        if tune and self._engine.dialect.name == "sqlite" \
+                and self._engine.url.database not in (None, "", ":memory:"):
+            tune_sqlite(self._engine, sqlite_pragmas())
+        if reset:
+            Base.metadata.drop_all(self._engine)
+        Base.metadata.create_all(self._engine, checkfirst=True)
+        self.migrate()
+        self._sessions = scoped_session(
+            sessionmaker(bind=self._engine, expire_on_commit=False)
+        )
+
+    def migrate(self) -> None:
         """
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+        Brings an existing database up to the current schema by creating
+        the indexes of the users table that are missing.
+
+        Raises:
+            IntegrityError: If existing rows violate a unique index, for
+            instance duplicate emails, which must be merged first.
+        """
+        for index in User.__table__.indexes:
+            index.create(self._engine, checkfirst=True)
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session of the current thread, created on first use
+        """
+        return self._sessions()
+
+    def remove_session(self) -> None:
+        """
+        Closes the session of the current thread, giving its connection
+        back to the pool. The next access opens a new session.
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        self._sessions.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """
@@ -42,6 +217,9 @@ class DB:
 
         Returns:
             User: The newly added user.
+
+        Raises:
+            IntegrityError: If the email is already registered.
         """
         # user = self._session.query(User).filter_by(email=email).first()
         # if user is not None:
@@ -51,19 +229,74 @@ class DB:
 
         user = User(email=email, hashed_password=hashed_password)
         self._session.add(user)
-        self._session.commit()
+        try:
+            self._session.commit()
+        except IntegrityError:
+            self._session.rollback()
+            raise
 
         return user
 
-    def find_user_by(self, **kwargs) -> User:
+    def add_users(self, users: Iterable[dict], batch_size: int = 1000
+                  ) -> int:
+        """
+        Inserts many users with one executemany and one commit per batch.
+
+        Args:
+            users (Iterable[dict]): Rows with email and hashed_password.
+            batch_size (int): The number of rows per INSERT batch.
+
+        Returns:
+            int: The number of inserted users.
+        """
+        count = 0
+        batch = []
+        for user in users:
+            batch.append(user)
+            if len(batch) >= batch_size:
+                count += self._insert_batch(batch)
+                batch = []
+        if batch:
+            count += self._insert_batch(batch)
+        return count
+
+    def _insert_batch(self, batch: List[dict]) -> int:
+        """
+        Inserts and commits one batch of user rows.
+
+        Args:
+            batch (List[dict]): The rows to insert.
+
+        Returns:
+            int: The number of inserted rows.
+        """
+        self._session.execute(insert(User), batch)
+        self._session.commit()
+        return len(batch)
+
+    def all_emails(self) -> Set[str]:
+        """
+        Returns the emails of every user, streamed from the database.
+
+        Returns:
+            Set[str]: The emails.
+        """
+        rows = self._session.query(User.email).yield_per(10000)
+        return {email for email, in rows}
+
+    def find_user_by(self, columns: Optional[Sequence[str]] = None,
+                     **kwargs) -> Union[User, Row]:
         """
         Finds a user in the database by the specified attributes.
 
         Args:
+            columns (Sequence[str]): Load only these columns and return
+                them as a row, e.g. ("id", "email"); the whole User by
+                default.
             **kwargs: The attributes to filter by.
 
         Returns:
-            User: The found user.
+            Union[User, Row]: The found user, or the row of its columns.
 
         Raises:
             NoResultFound: If no user is found.
@@ -71,24 +304,70 @@ class DB:
             are provided or if any key does not correspond
             to a column name
         """
-        if not kwargs:
+        if not kwargs or not COLUMN_NAMES.issuperset(kwargs):
             raise InvalidRequestError
-
-        column_names = User.__table__.columns.keys()
-        for key in kwargs.keys():
-            if key not in column_names:
+        if columns is not None:
+            columns = tuple(columns)
+            if not columns or not COLUMN_NAMES.issuperset(columns):
                 raise InvalidRequestError
 
-        user = self._session.query(User).filter_by(**kwargs).first()
+        if None in kwargs.values():
+            # "= NULL" never matches, IS NULL needs a statement of its own
+            statement = lookup_statement(columns, ()).filter_by(**kwargs)
+            params = {}
+        else:
+            statement = lookup_statement(columns, tuple(sorted(kwargs)))
+            params = kwargs
+        result = self._session.execute(statement, params)
+        user = result.scalars().first() if columns is None \
+            else result.first()
 
         if user is None:
             raise NoResultFound
 
         return user
 
+    def query_plan(self, **kwargs) -> List[str]:
+        """
+        Returns the SQLite query plan of find_user_by(**kwargs), from
+        the same cached statement.
+
+        Args:
+            **kwargs: The attributes to filter by.
+
+        Returns:
+            List[str]: The detail lines of EXPLAIN QUERY PLAN.
+        """
+        statement = lookup_statement(None, tuple(sorted(kwargs))).params(
+            **kwargs
+        )
+        sql = str(statement.compile(
+            dialect=self._engine.dialect,
+            compile_kwargs={"literal_binds": True},
+        ))
+        rows = self._session.execute(text("EXPLAIN QUERY PLAN " + sql))
+        return [row[-1] for row in rows]
+
+    def unindexed_lookups(self) -> List[str]:
+        """
+        Lists the HOT_LOOKUPS columns whose find_user_by query would scan
+        the users table instead of using an index.
+
+        Returns:
+            List[str]: The offending column names, empty when all good.
+        """
+        return [
+            column for column in HOT_LOOKUPS
+            if not any(
+                "USING INDEX" in detail or "USING COVERING INDEX" in detail
+                for detail in self.query_plan(**{column: "x"})
+            )
+        ]
+
     def update_user(self, user_id: int, **kwargs) -> None:
         """
-        Updates a user in the database.
+        Updates a user in the database with a single
+        UPDATE users SET ... WHERE id = ? statement.
 
         Args:
             user_id (int): The ID of the user to update.
@@ -96,15 +375,84 @@ class DB:
 
         Raises:
             ValueError: If any key does not correspond to a column name.
+            NoResultFound: If no user has this ID.
+        """
+        if not COLUMN_NAMES.issuperset(kwargs):
+            raise ValueError
+        if not kwargs:
+            self.find_user_by(columns=("id",), id=user_id)
+            return
+
+        params = dict(kwargs, _id=user_id)
+        result = self._session.execute(
+            update_statement(tuple(sorted(kwargs))), params
+        )
+        self._session.commit()
+        if result.rowcount == 0:
+            raise NoResultFound
+        user = self._session.identity_map.get(identity_key(User, user_id))
+        if user is not None:
+            self._session.expire(user, list(kwargs))
+
+    def update_users_bulk(self, changes: Iterable[Dict], batch_size: int = 1000
+                          ) -> int:
         """
-        user = self.find_user_by(id=user_id)
+        Updates many users with one executemany per set of updated columns
+        and one commit per batch.
 
-        column_names = User.__table__.columns.keys()
-        for key in kwargs.keys():
-            if key not in column_names:
+        The rows are written directly, users already loaded in the session
+        keep their former values. Do not change session_id here: the
+        session cache of Auth would keep accepting the former sessions,
+        use Auth.destroy_sessions instead.
+
+        Args:
+            changes (Iterable[Dict]): The id of each user and the values of
+                the columns to update.
+            batch_size (int): The number of changes per batch.
+
+        Returns:
+            int: The number of updated users, unknown ids being skipped.
+
+        Raises:
+            ValueError: If a change has no id or any key does not
+            correspond to a column name.
+        """
+        count = 0
+        batch = []
+        for change in changes:
+            if "id" not in change or not COLUMN_NAMES.issuperset(change):
                 raise ValueError
+            batch.append(change)
+            if len(batch) >= batch_size:
+                count += self._update_batch(batch)
+                batch = []
+        if batch:
+            count += self._update_batch(batch)
+        return count
+
+    def _update_batch(self, batch: List[Dict]) -> int:
+        """
+        Updates and commits one batch of changes, grouped by their set of
+        columns.
 
-        for key, value in kwargs.items():
-            setattr(user, key, value)
+        Args:
+            batch (List[Dict]): The changes.
 
+        Returns:
+            int: The number of updated rows.
+        """
+        groups = {}
+        for change in batch:
+            params = dict(change)
+            params["_id"] = params.pop("id")
+            keys = tuple(sorted(key for key in params if key != "_id"))
+            if keys:
+                groups.setdefault(keys, []).append(params)
+        count = 0
+        for keys, params in groups.items():
+            result = self._session.execute(
+                update_statement(keys), params
+            )
+            count += result.rowcount
         self._session.commit()
+        return count
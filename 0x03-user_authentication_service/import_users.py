@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Bulk import of users into the authentication database.
+
+Usage: ./import_users.py users.csv [--format csv|ndjson] [--workers N]
+
+The input has email and password fields ("-" reads stdin). The users
+are added to the existing database, which is opened without a reset:
+emails already in it or seen earlier in the input are skipped.
+Passwords are hashed with bcrypt by a pool of processes, and the users
+are inserted with one executemany and one commit per batch.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, TextIO, Tuple
+
+from auth import _hash_password
+from db import DB
+
+
+def read_rows(stream: TextIO, input_format: str) -> Iterator[dict]:
+    """
+    Yields the rows of a CSV or NDJSON stream.
+
+    Args:
+        stream (TextIO): The input.
+        input_format (str): "csv" or "ndjson".
+
+    Returns:
+        Iterator[dict]: The rows.
+    """
+    if input_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def new_credentials(rows: Iterable[dict], emails: set,
+                    report: dict) -> Iterator[Tuple[str, str]]:
+    """
+    Yields the (email, password) of the valid rows whose email is not in
+    emails, adding it to emails and counting the rows in report.
+
+    Args:
+        rows (Iterable[dict]): The input rows.
+        emails (set): The index of the known emails.
+        report (dict): The counters.
+
+    Returns:
+        Iterator[Tuple[str, str]]: The credentials to import.
+    """
+    for row in rows:
+        report["read"] += 1
+        email = row.get("email")
+        password = row.get("password")
+        if not email or not password:
+            report["invalid"] += 1
+            continue
+        if email in emails:
+            report["duplicates"] += 1
+            continue
+        emails.add(email)
+        yield email, password
+
+
+def hash_chunk(credentials: List[Tuple[str, str]]) -> List[dict]:
+    """
+    Hashes the passwords of a chunk of credentials.
+
+    Args:
+        credentials (List[Tuple[str, str]]): (email, password) pairs.
+
+    Returns:
+        List[dict]: The user rows to insert.
+    """
+    return [
+        {"email": email, "hashed_password": _hash_password(password)}
+        for email, password in credentials
+    ]
+
+
+def hashed_users(credentials: Iterable[Tuple[str, str]], workers: int,
+                 chunk_size: int) -> Iterator[dict]:
+    """
+    Hashes the passwords across a process pool, with at most
+    2 * workers chunks in flight, and yields the rows in input order.
+
+    Args:
+        credentials (Iterable[Tuple[str, str]]): (email, password) pairs.
+        workers (int): The number of processes, inline when 1 or less.
+        chunk_size (int): The number of passwords per task.
+
+    Returns:
+        Iterator[dict]: The user rows to insert.
+    """
+    iterator = iter(credentials)
+    chunks = iter(lambda: list(islice(iterator, chunk_size)), [])
+    if workers <= 1:
+        for chunk in chunks:
+            yield from hash_chunk(chunk)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(hash_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main():
+    """
+    Imports the users and prints the report as JSON.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="CSV or NDJSON file, - for stdin")
+    parser.add_argument("--format", choices=("csv", "ndjson"),
+                        help="guessed from the file extension by default")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    input_format = args.format or (
+        "ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv"
+    )
+    start = time.perf_counter()
+    db = DB(reset=False)
+    emails = db.all_emails()
+    report = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="")
+    try:
+        credentials = new_credentials(
+            read_rows(stream, input_format), emails, report
+        )
+        report["imported"] = db.add_users(
+            hashed_users(credentials, args.workers, args.chunk_size),
+            args.batch_size,
+        )
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["rows_per_second"] = round(
+        report["read"] / report["seconds"]) if report["seconds"] else 0
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
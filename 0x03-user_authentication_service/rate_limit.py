@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+This module provides a token-bucket rate limiter used to throttle login
+attempts before any password hashing takes place.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from math import ceil
+from os import getenv
+from typing import Optional, Tuple
+
+
+# Defaults of the LOGIN_RATE_LIMIT_* variables: 5 attempts per email and
+# 50 failed attempts per IP address per minute. The IP budget is larger
+# because many users can share an address behind NAT or a proxy.
+DEFAULT_BURST = 5
+DEFAULT_IP_BURST = 50
+DEFAULT_PERIOD = 60
+DEFAULT_MAX_KEYS = 10000
+
+
+class MemoryBackend:
+    """
+    Stores token buckets in a bounded, process-local LRU mapping.
+    """
+
+    def __init__(self, max_keys: int = 10000) -> None:
+        """
+        Initializes the backend.
+
+        Args:
+            max_keys (int): The maximum number of buckets kept in memory.
+                The least recently used bucket is evicted beyond that.
+        """
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(
+        self, key: str, capacity: float, rate: float, now: float
+    ) -> float:
+        """
+        Takes one token from the bucket stored under the given key.
+
+        Args:
+            key (str): The bucket key.
+            capacity (float): The maximum number of tokens in a bucket.
+            rate (float): The number of tokens refilled per second.
+            now (float): The current monotonic time.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the number of seconds
+            until the next token is available.
+        """
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def refund(self, key: str, capacity: float) -> None:
+        """
+        Gives back one token to the bucket stored under the given key.
+
+        Args:
+            key (str): The bucket key.
+            capacity (float): The maximum number of tokens in a bucket.
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                tokens, stamp = bucket
+                self._buckets[key] = (min(capacity, tokens + 1), stamp)
+
+    def reset(self, key: str) -> None:
+        """
+        Forgets the bucket stored under the given key.
+
+        Args:
+            key (str): The bucket key.
+        """
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SQLiteBackend:
+    """
+    Stores token buckets in a SQLite file so that every worker process
+    on the host shares the same limits.
+    """
+
+    def __init__(self, path: str, max_keys: int = 10000) -> None:
+        """
+        Initializes the backend.
+
+        Args:
+            path (str): The path of the SQLite file.
+            max_keys (int): The maximum number of buckets kept in the file.
+                The least recently used buckets are evicted beyond that.
+        """
+        self.path = path
+        self.max_keys = max_keys
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL, stamp REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_buckets_stamp "
+                "ON buckets (stamp)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns the SQLite connection of the current thread.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(
+        self, key: str, capacity: float, rate: float, now: float
+    ) -> float:
+        """
+        Takes one token from the bucket stored under the given key.
+
+        Args:
+            key (str): The bucket key.
+            capacity (float): The maximum number of tokens in a bucket.
+            rate (float): The number of tokens refilled per second.
+            now (float): The current wall-clock time.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the number of seconds
+            until the next token is available.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, stamp FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, stamp = row if row is not None else (capacity, now)
+            tokens = min(capacity, tokens + max(0, now - stamp) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            if row is None:
+                conn.execute(
+                    "DELETE FROM buckets WHERE key IN ("
+                    "SELECT key FROM buckets ORDER BY stamp DESC "
+                    "LIMIT -1 OFFSET ?)", (self.max_keys,)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def refund(self, key: str, capacity: float) -> None:
+        """
+        Gives back one token to the bucket stored under the given key.
+
+        Args:
+            key (str): The bucket key.
+            capacity (float): The maximum number of tokens in a bucket.
+        """
+        self._connection().execute(
+            "UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?",
+            (capacity, key)
+        )
+
+    def reset(self, key: str) -> None:
+        """
+        Forgets the bucket stored under the given key.
+
+        Args:
+            key (str): The bucket key.
+        """
+        self._connection().execute(
+            "DELETE FROM buckets WHERE key = ?", (key,)
+        )
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter keyed by client IP address and by email.
+
+    Every attempt takes a token from both buckets. A successful login
+    gives the IP token back and clears the email bucket, so only failed
+    attempts count against an address shared by many users.
+    """
+
+    def __init__(
+        self, capacity: float = DEFAULT_BURST, period: float = DEFAULT_PERIOD,
+        backend=None, clock=None, ip_capacity: float = DEFAULT_IP_BURST
+    ) -> None:
+        """
+        Initializes the limiter.
+
+        Args:
+            capacity (float): The number of attempts allowed in a burst
+                for one email.
+            period (float): The number of seconds needed to refill a
+                whole burst.
+            backend: The bucket storage, a MemoryBackend by default.
+            clock: A callable returning the current time in seconds.
+            ip_capacity (float): The number of failed attempts allowed in
+                a burst for one IP address.
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.ip_capacity = ip_capacity
+        self.ip_rate = ip_capacity / period
+        self.backend = backend if backend is not None else MemoryBackend()
+        if clock is None:
+            clock = time.time if isinstance(
+                self.backend, SQLiteBackend
+            ) else time.monotonic
+        self.clock = clock
+
+    def hit(
+        self, ip: Optional[str], email: Optional[str]
+    ) -> Tuple[bool, int]:
+        """
+        Records a login attempt for the client IP and the email.
+
+        Args:
+            ip (str): The client IP address.
+            email (str): The email the client tries to log in with.
+
+        Returns:
+            Tuple[bool, int]: Whether the attempt is allowed and, if not,
+            the number of seconds to send in the Retry-After header.
+        """
+        now = self.clock()
+        wait = 0.0
+        buckets = (
+            (ip, f"ip:{ip}", self.ip_capacity, self.ip_rate),
+            (email, f"email:{email}", self.capacity, self.rate),
+        )
+        for value, key, capacity, rate in buckets:
+            if value is None:
+                continue
+            wait = max(wait, self.backend.take(key, capacity, rate, now))
+        if wait > 0:
+            return False, max(1, ceil(wait))
+        return True, 0
+
+    def succeeded(self, ip: Optional[str], email: str) -> None:
+        """
+        Records a successful login: refunds the token the attempt took
+        from the IP bucket and clears the email bucket.
+
+        Args:
+            ip (str): The client IP address.
+            email (str): The email that logged in.
+        """
+        if ip is not None:
+            self.backend.refund(f"ip:{ip}", self.ip_capacity)
+        self.reset(email)
+
+    def reset(self, email: str) -> None:
+        """
+        Clears the email bucket.
+
+        Args:
+            email (str): The email to clear.
+        """
+        self.backend.reset(f"email:{email}")
+
+
+def limiter_from_env() -> Optional[RateLimiter]:
+    """
+    Builds the login limiter from the LOGIN_RATE_LIMIT_* environment
+    variables.
+
+    Returns:
+        Optional[RateLimiter]: The limiter, or None when
+        LOGIN_RATE_LIMIT_BURST, LOGIN_RATE_LIMIT_IP_BURST or
+        LOGIN_RATE_LIMIT_PERIOD is 0.
+    """
+    try:
+        capacity = float(getenv("LOGIN_RATE_LIMIT_BURST", DEFAULT_BURST))
+        ip_capacity = float(
+            getenv("LOGIN_RATE_LIMIT_IP_BURST", DEFAULT_IP_BURST)
+        )
+        period = float(getenv("LOGIN_RATE_LIMIT_PERIOD", DEFAULT_PERIOD))
+        max_keys = int(
+            getenv("LOGIN_RATE_LIMIT_MAX_KEYS", DEFAULT_MAX_KEYS)
+        )
+    except ValueError:
+        capacity, ip_capacity = DEFAULT_BURST, DEFAULT_IP_BURST
+        period, max_keys = DEFAULT_PERIOD, DEFAULT_MAX_KEYS
+    if capacity <= 0 or ip_capacity <= 0 or period <= 0:
+        return None
+
+    backend_path = getenv("LOGIN_RATE_LIMIT_SQLITE")
+    if backend_path:
+        backend = SQLiteBackend(backend_path, max_keys)
+    else:
+        backend = MemoryBackend(max_keys)
+    return RateLimiter(capacity, period, backend, ip_capacity=ip_capacity)
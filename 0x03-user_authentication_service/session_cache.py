@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+This module provides a bounded LRU cache with expiry that maps session
+IDs to the lightweight user rows of Auth.get_profile_from_session_id.
+
+Invalidation is process-local: another worker process that logs the
+user out is only seen once the entry expires, so the TTL bounds how long
+a destroyed session may still be accepted there.
+"""
+import threading
+import time
+from collections import OrderedDict
+from os import getenv
+from typing import Any, Optional
+
+
+class SessionCache:
+    """
+    Maps session IDs to user rows, evicting the least recently used entry
+    beyond max_entries and dropping entries older than ttl seconds.
+    """
+
+    def __init__(
+        self, max_entries: int = 10000, ttl: float = 60, clock=None
+    ) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            max_entries (int): The maximum number of cached sessions.
+            ttl (float): The number of seconds an entry stays valid.
+            clock: A callable returning the current time in seconds,
+                time.monotonic by default.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock if clock is not None else time.monotonic
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, session_id: str) -> Optional[Any]:
+        """
+        Returns the cached user of a session.
+
+        Args:
+            session_id (str): The session ID.
+
+        Returns:
+            Optional[Any]: The user row, or None when it is not cached or
+            has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires = entry
+            if self.clock() >= expires:
+                self._remove(session_id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return user
+
+    def put(self, session_id: str, user: Any, generation: int) -> None:
+        """
+        Caches the user of a session, unless an invalidation happened
+        since generation was read: the user was then loaded before the
+        change and may be stale.
+
+        Args:
+            session_id (str): The session ID.
+            user (Any): The user row, with an id attribute.
+            generation (int): The value of self.generation read before
+                the user was loaded from the database.
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._remove(session_id)
+            previous = self._by_user.get(user.id)
+            if previous is not None:
+                self._remove(previous)
+            self._entries[session_id] = (user, self.clock() + self.ttl)
+            self._by_user[user.id] = session_id
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def discard_user(self, user_id: int) -> None:
+        """
+        Drops the cached session of a user. Call it after the database
+        change that ends or replaces the session.
+
+        Args:
+            user_id (int): The user's ID.
+        """
+        with self._lock:
+            self.generation += 1
+            session_id = self._by_user.get(user_id)
+            if session_id is not None:
+                self._remove(session_id)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """
+        Drops every entry.
+        """
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, session_id: str) -> None:
+        """
+        Removes an entry and its user index, the lock being held.
+
+        Args:
+            session_id (str): The session ID.
+        """
+        entry = self._entries.pop(session_id, None)
+        if entry is not None and \
+                self._by_user.get(entry[0].id) == session_id:
+            del self._by_user[entry[0].id]
+
+    def stats(self) -> dict:
+        """
+        Returns the cache metrics.
+
+        Returns:
+            dict: The size, hits, misses, hit ratio, evictions,
+            expirations and invalidations.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def session_cache_from_env() -> Optional[SessionCache]:
+    """
+    Builds the session cache from the AUTH_SESSION_CACHE_* environment
+    variables.
+
+    Returns:
+        Optional[SessionCache]: The cache, or None when
+        AUTH_SESSION_CACHE_SIZE or AUTH_SESSION_CACHE_TTL is 0.
+    """
+    try:
+        max_entries = int(getenv("AUTH_SESSION_CACHE_SIZE", "10000"))
+        ttl = float(getenv("AUTH_SESSION_CACHE_TTL", "60"))
+    except ValueError:
+        max_entries, ttl = 10000, 60
+    if max_entries <= 0 or ttl <= 0:
+        return None
+    return SessionCache(max_entries, ttl)
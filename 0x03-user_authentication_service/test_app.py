@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests of the authentication service routes.
+"""
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+
+class TestConcurrentClients(unittest.TestCase):
+    """
+    Hammers register/login/profile/logout from parallel threads, each
+    request using the DB session of its thread.
+    """
+
+    THREADS = 8
+    ROUNDS = 2
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Imports the app on a fresh SQLite file, without login limits.
+        """
+        cls.directory = tempfile.mkdtemp(prefix="test-app-")
+        environ = {
+            "AUTH_DB_URL": "sqlite:///" + os.path.join(cls.directory, "a.db"),
+            "AUTH_DB_RESET": "1",
+            "LOGIN_RATE_LIMIT_BURST": "0",
+        }
+        sys.modules.pop("app", None)
+        with mock.patch.dict(os.environ, environ):
+            cls.app = importlib.import_module("app").app
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Removes the SQLite file.
+        """
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def client_flow(self, index: int, results: list) -> None:
+        """
+        Runs the rounds of one client and records its status codes.
+
+        Args:
+            index (int): The client number.
+            results (list): The shared list of (index, statuses) results.
+        """
+        client = self.app.test_client(use_cookies=False)
+        try:
+            statuses = []
+            for round_number in range(self.ROUNDS):
+                form = {
+                    "email": "user{}-{}@example.com".format(
+                        index, round_number
+                    ),
+                    "password": "secret",
+                }
+                statuses.append(client.post("/users", data=form).status_code)
+                login = client.post("/sessions", data=form)
+                statuses.append(login.status_code)
+                cookie = login.headers["Set-Cookie"].split(";", 1)[0]
+                headers = {"Cookie": cookie}
+                statuses.append(
+                    client.get("/profile", headers=headers).status_code
+                )
+                statuses.append(
+                    client.delete("/sessions", headers=headers).status_code
+                )
+                statuses.append(
+                    client.get("/profile", headers=headers).status_code
+                )
+            results.append((index, statuses))
+        except Exception as error:
+            results.append((index, error))
+
+    def test_parallel_register_login_logout(self) -> None:
+        """
+        Every request of every thread gets its expected status.
+        """
+        results = []
+        threads = [
+            threading.Thread(target=self.client_flow, args=(index, results))
+            for index in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.THREADS)
+        expected = [200, 200, 200, 302, 403] * self.ROUNDS
+        for index, statuses in results:
+            self.assertEqual(statuses, expected, "client {}".format(index))
+
+
+if __name__ == "__main__":
+    unittest.main()
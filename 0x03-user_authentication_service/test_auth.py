@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests of the Auth class.
+"""
+import os
+import unittest
+from unittest import mock
+
+from auth import Auth
+
+
+class TestSessionCache(unittest.TestCase):
+    """
+    Checks that every way of ending a session invalidates the cache.
+    """
+
+    def setUp(self) -> None:
+        """
+        Builds an Auth on an in-memory database with the session cache.
+        """
+        environ = {
+            "AUTH_DB_URL": "sqlite://",
+            "AUTH_SESSION_CACHE_SIZE": "100",
+            "AUTH_SESSION_CACHE_TTL": "60",
+        }
+        with mock.patch.dict(os.environ, environ):
+            self.auth = Auth()
+        self.assertIsNotNone(self.auth.session_cache)
+        self.auth.register_user("x@y", "pwd")
+        self.session_id = self.auth.create_session("x@y")
+        # fills the cache
+        self.auth.get_profile_from_session_id(self.session_id)
+
+    def test_destroy_session(self) -> None:
+        """
+        A destroyed session is no longer accepted.
+        """
+        profile = self.auth.get_profile_from_session_id(self.session_id)
+        self.auth.destroy_session(profile.id)
+        self.assertIsNone(
+            self.auth.get_profile_from_session_id(self.session_id)
+        )
+
+    def test_destroy_sessions(self) -> None:
+        """
+        Sessions destroyed in bulk are no longer accepted.
+        """
+        profile = self.auth.get_profile_from_session_id(self.session_id)
+        self.assertEqual(self.auth.destroy_sessions([profile.id]), 1)
+        self.assertIsNone(
+            self.auth.get_profile_from_session_id(self.session_id)
+        )
+        self.assertIsNone(
+            self.auth.get_user_from_session_id(self.session_id)
+        )
+
+    def test_new_session_replaces_old(self) -> None:
+        """
+        Logging in again ends the former session.
+        """
+        new_session_id = self.auth.create_session("x@y")
+        self.assertIsNone(
+            self.auth.get_profile_from_session_id(self.session_id)
+        )
+        self.assertEqual(
+            self.auth.get_profile_from_session_id(new_session_id).email,
+            "x@y"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
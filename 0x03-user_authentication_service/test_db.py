@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Tests of the DB module.
+"""
+import unittest
+
+from db import DB, HOT_LOOKUPS
+
+
+class TestQueryPlans(unittest.TestCase):
+    """
+    Checks that the hot lookups of find_user_by use an index.
+    """
+
+    def test_hot_lookups_use_an_index(self) -> None:
+        """
+        No HOT_LOOKUPS column is looked up with a table scan.
+        """
+        db = DB("sqlite://")
+        self.assertEqual(db.unindexed_lookups(), [])
+
+    def test_unindexed_column_scans(self) -> None:
+        """
+        The check does report a lookup without an index.
+        """
+        db = DB("sqlite://")
+        self.assertNotIn("hashed_password", HOT_LOOKUPS)
+        plan = db.query_plan(hashed_password="x")
+        self.assertTrue(any(detail.startswith("SCAN") for detail in plan))
+
+
+if __name__ == "__main__":
+    unittest.main()
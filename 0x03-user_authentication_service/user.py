@@ -2,7 +2,7 @@
 """
 This module defines the User model for the database.
 """
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 Base = declarative_base()
 
@@ -17,6 +17,18 @@ class User(Base):
     hashed_password = Column(String(250), nullable=False)
     session_id = Column(String(250), nullable=True)
     reset_token = Column(String(250), nullable=True)
+    # The lookup columns of find_user_by are indexed; the tokens are
+    # unique among non-null values (partial indexes on SQLite and
+    # PostgreSQL, NULLs being distinct in a MySQL unique index anyway).
+    __table_args__ = (
+        Index("ix_users_email", "email", unique=True),
+        Index("ix_users_session_id", "session_id", unique=True,
+              sqlite_where=session_id.isnot(None),
+              postgresql_where=session_id.isnot(None)),
+        Index("ix_users_reset_token", "reset_token", unique=True,
+              sqlite_where=reset_token.isnot(None),
+              postgresql_where=reset_token.isnot(None)),
+    )
 
     def __repr__(self) -> str:
         """
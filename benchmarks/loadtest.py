@@ -0,0 +1,717 @@
+#!/usr/bin/env python3
+"""
+Load generator for the three authentication APIs of this repository.
+
+Drives 0x01-Basic_authentication, 0x02-Session_authentication or
+0x03-user_authentication_service either in-process, through the Flask
+test client, or over HTTP against a running server, with a weighted mix
+of scenarios (register, login, profile, logout, reset) and a number of
+concurrent workers. Throughput and latency histograms are printed as
+JSON.
+
+    ./benchmarks/loadtest.py --target 0x03 --concurrency 8 --duration 10
+    ./benchmarks/loadtest.py --target 0x02 --url http://127.0.0.1:5000 \\
+        --mix login=1,profile=8,register=1 --requests 5000
+
+0x01 and 0x02 only let authenticated users create users, so the workers
+sign in with --email/--password (created automatically in-process) to
+register their own user. In-process runs disable the login rate limiter;
+against a server, set LOGIN_RATE_LIMIT_BURST=0 there.
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+from uuid import uuid4
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECTS = {
+    "0x01": "0x01-Basic_authentication",
+    "0x02": "0x02-Session_authentication",
+    "0x03": "0x03-user_authentication_service",
+}
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000,
+              2500, 5000)
+
+
+class Result:
+    """
+    Status, lower-cased headers and body of one response.
+    """
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        """
+        Stores the parts of a response.
+        """
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """
+        Returns the decoded JSON body, None when it is not JSON.
+        """
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+    def cookie(self, name: str) -> Optional[str]:
+        """
+        Returns the value of a cookie set by the response.
+        """
+        cookie = SimpleCookie()
+        cookie.load(self.headers.get("set-cookie", ""))
+        morsel = cookie.get(name)
+        return morsel.value if morsel is not None else None
+
+
+class InProcessClient:
+    """
+    Client calling a Flask application through its test client.
+    """
+
+    def __init__(self, app) -> None:
+        """
+        Creates a cookie-less test client of the application.
+        """
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method: str, path: str, form: dict = None,
+                body: dict = None, headers: dict = None) -> Result:
+        """
+        Sends one request.
+        """
+        response = self.client.open(
+            path, method=method, data=form, json=body, headers=headers
+        )
+        return Result(
+            response.status_code,
+            {name.lower(): value for name, value in response.headers.items()},
+            response.get_data(),
+        )
+
+
+class HttpClient:
+    """
+    Client sending requests over one keep-alive HTTP connection.
+    """
+
+    def __init__(self, url: str) -> None:
+        """
+        Opens a connection to the server at url.
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.conn = http.client.HTTPConnection(self.host, self.port)
+
+    def request(self, method: str, path: str, form: dict = None,
+                body: dict = None, headers: dict = None) -> Result:
+        """
+        Sends one request, reconnecting once if the server closed the
+        connection.
+        """
+        headers = dict(headers or {})
+        payload = None
+        if form is not None:
+            payload = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in (0, 1):
+            try:
+                self.conn.request(
+                    method, self.prefix + path, body=payload, headers=headers
+                )
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = http.client.HTTPConnection(self.host, self.port)
+                if attempt:
+                    raise
+        return Result(
+            response.status,
+            {name.lower(): value for name, value in response.getheaders()},
+            data,
+        )
+
+
+class Context:
+    """
+    State of one worker: its client, its user and its latency samples.
+    """
+
+    def __init__(self, client, target: "Target", options) -> None:
+        """
+        Initializes a worker context.
+        """
+        self.client = client
+        self.target = target
+        self.options = options
+        self.email = None
+        self.password = None
+        self.user_id = None
+        self.own = None
+        self.session = None
+        self.admin = None
+        self.samples = {}
+        self.errors = {}
+        self.current = None
+
+    @contextmanager
+    def timing(self, scenario: str):
+        """
+        Measures the requests sent inside the block as one operation.
+        """
+        self.current = scenario
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.samples.setdefault(scenario, []).append(elapsed)
+            self.current = None
+
+    def check(self, result: Result, *expected: int) -> Result:
+        """
+        Counts an error for the running scenario on unexpected statuses.
+        """
+        if result.status not in expected:
+            self.errors[self.current] = self.errors.get(self.current, 0) + 1
+        return result
+
+
+class Target(ABC):
+    """
+    Scenarios of one API; subclasses implement the supported ones.
+    """
+
+    scenarios: Tuple[str, ...] = ()
+
+    @abstractmethod
+    def load_app(self):
+        """
+        Imports the Flask application of the project.
+        """
+
+    def seed(self, options) -> None:
+        """
+        Creates what the workers need before they start, in-process.
+        """
+
+    @abstractmethod
+    def setup(self, ctx: Context) -> None:
+        """
+        Prepares a worker, typically by registering and logging in.
+        """
+
+    def new_credentials(self) -> Tuple[str, str]:
+        """
+        Returns a fresh email and password.
+        """
+        return "load-{}@example.com".format(uuid4()), "pwd-{}".format(
+            uuid4().hex[:8]
+        )
+
+
+class BasicAuthTarget(Target):
+    """
+    Scenarios of 0x01-Basic_authentication.
+    """
+
+    scenarios = ("register", "profile")
+
+    def load_app(self):
+        """
+        Imports the Flask application of the project.
+        """
+        os.environ.setdefault("AUTH_TYPE", "basic_auth")
+        from api.v1.app import app
+        return app
+
+    def seed(self, options) -> None:
+        """
+        Creates the admin user used to register the workers.
+        """
+        from models.user import User
+        if not User.search({"email": options.email}):
+            user = User()
+            user.email = options.email
+            user.password = options.password
+            user.save()
+
+    @staticmethod
+    def basic(email: str, password: str) -> dict:
+        """
+        Returns the Authorization header of a user.
+        """
+        token = base64.b64encode(
+            "{}:{}".format(email, password).encode()
+        ).decode()
+        return {"Authorization": "Basic " + token}
+
+    def admin_headers(self, ctx: Context) -> dict:
+        """
+        Returns the headers authenticating the admin user.
+        """
+        return self.basic(ctx.options.email, ctx.options.password)
+
+    def create_user(self, ctx: Context) -> Result:
+        """
+        Creates a user with the admin credentials.
+        """
+        email, password = self.new_credentials()
+        result = ctx.client.request(
+            "POST", "/api/v1/users",
+            body={"email": email, "password": password},
+            headers=self.admin_headers(ctx),
+        )
+        if result.status == 201:
+            ctx.email, ctx.password = email, password
+            ctx.user_id = (result.json() or {}).get("id")
+        return result
+
+    def setup(self, ctx: Context) -> None:
+        """
+        Registers the user of the worker.
+        """
+        result = self.create_user(ctx)
+        if result.status != 201:
+            raise RuntimeError("cannot create a user: {} {}".format(
+                result.status, result.body[:200]))
+        ctx.own = (ctx.email, ctx.password, ctx.user_id)
+
+    def register(self, ctx: Context) -> None:
+        """
+        POST /api/v1/users
+        """
+        email, password = self.new_credentials()
+        with ctx.timing("register"):
+            ctx.check(ctx.client.request(
+                "POST", "/api/v1/users",
+                body={"email": email, "password": password},
+                headers=self.admin_headers(ctx),
+            ), 201)
+
+    def profile(self, ctx: Context) -> None:
+        """
+        GET /api/v1/users/<own id> with the worker credentials
+        """
+        email, password, user_id = ctx.own
+        with ctx.timing("profile"):
+            ctx.check(ctx.client.request(
+                "GET", "/api/v1/users/{}".format(user_id),
+                headers=self.basic(email, password),
+            ), 200)
+
+
+class SessionAuthTarget(BasicAuthTarget):
+    """
+    Scenarios of 0x02-Session_authentication.
+    """
+
+    scenarios = ("register", "login", "profile", "logout")
+
+    def load_app(self):
+        """
+        Builds the Flask application of the project.
+        """
+        os.environ.setdefault("AUTH_TYPE", "session_auth")
+        os.environ.setdefault("SESSION_NAME", "_my_session_id")
+        from api.v1.app import create_app
+        return create_app()
+
+    def cookie_header(self, ctx: Context, session: str = None) -> dict:
+        """
+        Returns the Cookie header carrying the session of the worker.
+        """
+        return {"Cookie": "{}={}".format(
+            ctx.options.session_name, session or ctx.session
+        )}
+
+    def admin_headers(self, ctx: Context) -> dict:
+        """
+        Returns the headers carrying a session of the admin user.
+        """
+        if ctx.admin is None:
+            result = ctx.client.request(
+                "POST", "/api/v1/auth_session/login",
+                form={"email": ctx.options.email,
+                      "password": ctx.options.password},
+            )
+            ctx.admin = result.cookie(ctx.options.session_name)
+            if result.status != 200 or not ctx.admin:
+                raise RuntimeError("cannot log in as {}: {}".format(
+                    ctx.options.email, result.status))
+        return self.cookie_header(ctx, ctx.admin)
+
+    def log_in(self, ctx: Context) -> Result:
+        """
+        Logs the worker user in and keeps its session ID.
+        """
+        result = ctx.client.request(
+            "POST", "/api/v1/auth_session/login",
+            form={"email": ctx.own[0], "password": ctx.own[1]},
+        )
+        session = result.cookie(ctx.options.session_name)
+        if result.status == 200 and session:
+            ctx.session = session
+        return result
+
+    def setup(self, ctx: Context) -> None:
+        """
+        Registers and logs in the user of the worker.
+        """
+        super().setup(ctx)
+        if self.log_in(ctx).status != 200:
+            raise RuntimeError("cannot log in")
+
+    def login(self, ctx: Context) -> None:
+        """
+        POST /api/v1/auth_session/login
+        """
+        with ctx.timing("login"):
+            ctx.check(self.log_in(ctx), 200)
+
+    def profile(self, ctx: Context) -> None:
+        """
+        GET /api/v1/users/me
+        """
+        if ctx.session is None:
+            self.log_in(ctx)
+        with ctx.timing("profile"):
+            ctx.check(ctx.client.request(
+                "GET", "/api/v1/users/me", headers=self.cookie_header(ctx)
+            ), 200)
+
+    def logout(self, ctx: Context) -> None:
+        """
+        DELETE /api/v1/auth_session/logout
+        """
+        if ctx.session is None:
+            self.log_in(ctx)
+        with ctx.timing("logout"):
+            ctx.check(ctx.client.request(
+                "DELETE", "/api/v1/auth_session/logout",
+                headers=self.cookie_header(ctx)
+            ), 200)
+        ctx.session = None
+
+
+class UserServiceTarget(Target):
+    """
+    Scenarios of 0x03-user_authentication_service.
+    """
+
+    scenarios = ("register", "login", "profile", "logout", "reset")
+
+    def load_app(self):
+        """
+        Imports the Flask application of the project.
+        """
+        from app import app
+        return app
+
+    def cookie_header(self, ctx: Context) -> dict:
+        """
+        Returns the Cookie header carrying the session of the worker.
+        """
+        return {"Cookie": "session_id={}".format(ctx.session)}
+
+    def log_in(self, ctx: Context) -> Result:
+        """
+        Logs the worker user in and keeps its session ID.
+        """
+        result = ctx.client.request(
+            "POST", "/sessions",
+            form={"email": ctx.email, "password": ctx.password},
+        )
+        session = result.cookie("session_id")
+        if result.status == 200 and session:
+            ctx.session = session
+        return result
+
+    def setup(self, ctx: Context) -> None:
+        """
+        Registers and logs in the user of the worker.
+        """
+        ctx.email, ctx.password = self.new_credentials()
+        result = ctx.client.request(
+            "POST", "/users",
+            form={"email": ctx.email, "password": ctx.password},
+        )
+        if result.status != 200 or self.log_in(ctx).status != 200:
+            raise RuntimeError("cannot register and log in")
+
+    def register(self, ctx: Context) -> None:
+        """
+        POST /users
+        """
+        email, password = self.new_credentials()
+        with ctx.timing("register"):
+            ctx.check(ctx.client.request(
+                "POST", "/users", form={"email": email, "password": password}
+            ), 200)
+
+    def login(self, ctx: Context) -> None:
+        """
+        POST /sessions
+        """
+        with ctx.timing("login"):
+            ctx.check(self.log_in(ctx), 200)
+
+    def profile(self, ctx: Context) -> None:
+        """
+        GET /profile
+        """
+        if ctx.session is None:
+            self.log_in(ctx)
+        with ctx.timing("profile"):
+            ctx.check(ctx.client.request(
+                "GET", "/profile", headers=self.cookie_header(ctx)
+            ), 200)
+
+    def logout(self, ctx: Context) -> None:
+        """
+        DELETE /sessions, which redirects to /
+        """
+        if ctx.session is None:
+            self.log_in(ctx)
+        with ctx.timing("logout"):
+            ctx.check(ctx.client.request(
+                "DELETE", "/sessions", headers=self.cookie_header(ctx)
+            ), 200, 302)
+        ctx.session = None
+
+    def reset(self, ctx: Context) -> None:
+        """
+        POST then PUT /reset_password, keeping the same password
+        """
+        with ctx.timing("reset"):
+            result = ctx.check(ctx.client.request(
+                "POST", "/reset_password", form={"email": ctx.email}
+            ), 200)
+            token = (result.json() or {}).get("reset_token")
+            if token is not None:
+                ctx.check(ctx.client.request(
+                    "PUT", "/reset_password", form={
+                        "email": ctx.email,
+                        "reset_token": token,
+                        "new_password": ctx.password,
+                    }
+                ), 200)
+
+
+TARGETS = {
+    "0x01": BasicAuthTarget,
+    "0x02": SessionAuthTarget,
+    "0x03": UserServiceTarget,
+}
+
+
+def parse_mix(text: str, supported: Tuple[str, ...]) -> Dict[str, float]:
+    """
+    Parses "name=weight,..." keeping the scenarios the target supports.
+    """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        if name not in supported:
+            print("scenario {!r} is not supported by this target, "
+                  "skipped".format(name), file=sys.stderr)
+            continue
+        mix[name] = float(weight or 1)
+    if not mix:
+        raise SystemExit("no supported scenario in --mix")
+    return mix
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Returns a percentile of sorted samples.
+    """
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def summarize(samples: List[float], errors: int, elapsed: float) -> dict:
+    """
+    Builds the report of one scenario, latencies in milliseconds.
+    """
+    samples = sorted(samples)
+    histogram = {}
+    index = 0
+    for bound in BUCKETS_MS:
+        count = 0
+        while index < len(samples) and samples[index] * 1000 <= bound:
+            count += 1
+            index += 1
+        histogram["le_{}".format(bound)] = count
+    histogram["le_inf"] = len(samples) - index
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput": round(len(samples) / elapsed, 2) if elapsed else 0,
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3)
+        if samples else 0,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3) if samples else 0,
+        "histogram_ms": histogram,
+    }
+
+
+def run(options) -> dict:
+    """
+    Runs the load test described by the command line options.
+    """
+    target = TARGETS[options.target]()
+    if options.url:
+        def make_client():
+            """
+            Returns a client of the remote server.
+            """
+            return HttpClient(options.url)
+    else:
+        os.environ["LOGIN_RATE_LIMIT_BURST"] = "0"
+        sys.path.insert(0, os.path.join(ROOT, PROJECTS[options.target]))
+        os.chdir(tempfile.mkdtemp(prefix="loadtest-"))
+        app = target.load_app()
+        target.seed(options)
+
+        def make_client():
+            """
+            Returns an in-process client of the application.
+            """
+            return InProcessClient(app)
+
+    mix = parse_mix(options.mix, target.scenarios)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    contexts = []
+    for _ in range(options.concurrency):
+        ctx = Context(make_client(), target, options)
+        target.setup(ctx)
+        contexts.append(ctx)
+
+    budget = [options.requests]
+    lock = threading.Lock()
+    deadline = [None]
+    barrier = threading.Barrier(options.concurrency + 1)
+
+    def worker(ctx: Context, seed: int):
+        """
+        Runs scenarios until the request budget or the duration is spent.
+        """
+        rng = random.Random(seed)
+        barrier.wait()
+        while True:
+            if options.requests:
+                with lock:
+                    if budget[0] <= 0:
+                        return
+                    budget[0] -= 1
+            elif time.perf_counter() >= deadline[0]:
+                return
+            name = rng.choices(names, weights)[0]
+            try:
+                getattr(target, name)(ctx)
+            except Exception:
+                ctx.errors[name] = ctx.errors.get(name, 0) + 1
+
+    threads = [
+        threading.Thread(target=worker, args=(ctx, options.seed + i))
+        for i, ctx in enumerate(contexts)
+    ]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + options.duration
+    start = time.perf_counter()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    scenarios = {}
+    all_samples = []
+    all_errors = 0
+    for name in names:
+        samples = [s for ctx in contexts for s in ctx.samples.get(name, [])]
+        errors = sum(ctx.errors.get(name, 0) for ctx in contexts)
+        scenarios[name] = summarize(samples, errors, elapsed)
+        all_samples.extend(samples)
+        all_errors += errors
+    return {
+        "target": PROJECTS[options.target],
+        "mode": "http" if options.url else "in-process",
+        "url": options.url,
+        "concurrency": options.concurrency,
+        "mix": mix,
+        "elapsed_seconds": round(elapsed, 3),
+        "total": summarize(all_samples, all_errors, elapsed),
+        "scenarios": scenarios,
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    """
+    Parses the command line, runs the load test and prints the report.
+    """
+    parser = argparse.ArgumentParser(
+        description="Load generator for the authentication APIs"
+    )
+    parser.add_argument("--target", choices=sorted(TARGETS), required=True)
+    parser.add_argument("--url", help="base URL of a running server; "
+                        "the application runs in-process when omitted")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10,
+                        help="seconds to run when --requests is not given")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="total number of scenarios to run")
+    parser.add_argument("--mix", default="register=1,login=2,profile=10,"
+                        "logout=1,reset=1")
+    parser.add_argument("--email", default="loadtest-admin@example.com",
+                        help="existing user allowed to create users "
+                        "(0x01 and 0x02)")
+    parser.add_argument("--password", default="loadtest-admin")
+    parser.add_argument("--session-name", default="_my_session_id",
+                        help="session cookie name of 0x02")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    options = parser.parse_args(argv)
+    if options.output:
+        # the in-process mode runs in a temporary directory
+        options.output = os.path.abspath(options.output)
+
+    report = json.dumps(run(options), indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the storage, authentication and redaction hot paths.
+
+Every benchmark runs on generated inputs of pinned sizes and records
+--samples timings (seconds per call). Results are written as JSON so
+that runs on different commits can be compared:
+
+    ./benchmarks/microbench.py --output before.json
+    git checkout other-branch
+    ./benchmarks/microbench.py --compare before.json
+
+--compare flags the benchmarks whose new timings are both slower than
+the baseline by more than --threshold and significantly so according to
+a one-sided Mann-Whitney U test (--alpha), and exits with status 1 when
+there is at least one such slowdown.
+
+Benchmarks whose project cannot be imported here (for instance without
+mysql-connector or SQLAlchemy) are reported as skipped.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import NormalDist, mean, median, stdev
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for project in ("0x00-personal_data", "0x02-Session_authentication",
+                "0x03-user_authentication_service"):
+    sys.path.insert(0, os.path.join(ROOT, project))
+
+SEED = 20240501
+AUTH_USERS = 1000
+SESSIONS = 1000
+DB_USERS = 1000
+BENCHMARKS = {}
+
+
+def benchmark(name: str, sizes: Optional[Tuple[int, ...]] = None):
+    """
+    Registers a benchmark factory. The factory receives the input size
+    and returns the callable to time; sizes None means the storage sizes
+    chosen on the command line.
+    """
+    def decorator(factory: Callable) -> Callable:
+        """
+        Stores the factory.
+        """
+        BENCHMARKS[name] = (factory, sizes)
+        return factory
+    return decorator
+
+
+class FakeRequest:
+    """
+    The parts of a Flask request the auth classes read.
+    """
+
+    def __init__(self, headers: dict = None, cookies: dict = None):
+        """
+        Stores the headers and cookies.
+        """
+        self.headers = headers or {}
+        self.cookies = cookies or {}
+
+
+def fill_users(count: int) -> list:
+    """
+    Replaces the in-memory User store with count generated users.
+    """
+    from models.base import DATA
+    from models.user import User
+    rng = random.Random(SEED)
+    DATA["User"] = {}
+    users = []
+    for i in range(count):
+        user = User(id="user-{}".format(i),
+                    email="user{}@example.com".format(i),
+                    first_name="First{}".format(rng.randrange(count)),
+                    last_name="Last{}".format(i))
+        user._password = "{:064x}".format(rng.getrandbits(256))
+        DATA["User"][user.id] = user
+        users.append(user)
+    return users
+
+
+@benchmark("base.search")
+def bench_base_search(size: int) -> Callable:
+    """
+    User.search on the email of the last user.
+    """
+    from models.user import User
+    fill_users(size)
+    attributes = {"email": "user{}@example.com".format(size - 1)}
+    return lambda: User.search(attributes)
+
+
+@benchmark("base.get")
+def bench_base_get(size: int) -> Callable:
+    """
+    User.get of an existing id.
+    """
+    from models.user import User
+    fill_users(size)
+    user_id = "user-{}".format(size // 2)
+    return lambda: User.get(user_id)
+
+
+@benchmark("base.save")
+def bench_base_save(size: int) -> Callable:
+    """
+    User.save of an existing user, which rewrites the whole file.
+    """
+    users = fill_users(size)
+    return users[size // 2].save
+
+
+@benchmark("base.load_from_file")
+def bench_base_load(size: int) -> Callable:
+    """
+    User.load_from_file of size users.
+    """
+    from models.user import User
+    fill_users(size)
+    User.save_to_file()
+    return User.load_from_file
+
+
+@benchmark("basic_auth.current_user", (AUTH_USERS,))
+def bench_basic_auth(size: int) -> Callable:
+    """
+    BasicAuth.current_user: header decoding, search and SHA-256 check.
+    """
+    from api.v1.auth.basic_auth import BasicAuth
+    users = fill_users(size)
+    user = users[size // 2]
+    user.password = "secret"
+    token = base64.b64encode(
+        "{}:secret".format(user.email).encode()
+    ).decode()
+    request = FakeRequest({"Authorization": "Basic " + token})
+    auth = BasicAuth()
+    return lambda: auth.current_user(request)
+
+
+def bench_session(cls_path: str, size: int) -> Callable:
+    """
+    user_id_for_session_id of size sessions of an auth class.
+    """
+    module_name, class_name = cls_path.rsplit(".", 1)
+    module = __import__(module_name, fromlist=[class_name])
+    from api.v1.auth.session_auth import SessionAuth
+    SessionAuth.user_id_by_session_id.clear()
+    os.environ["SESSION_DURATION"] = "3600"
+    auth = getattr(module, class_name)()
+    session_ids = [auth.create_session("user-{}".format(i))
+                   for i in range(size)]
+    session_id = session_ids[size // 2]
+    return lambda: auth.user_id_for_session_id(session_id)
+
+
+@benchmark("session_auth.user_id_for_session_id", (SESSIONS,))
+def bench_session_auth(size: int) -> Callable:
+    """
+    SessionAuth.user_id_for_session_id.
+    """
+    return bench_session("api.v1.auth.session_auth.SessionAuth", size)
+
+
+@benchmark("session_exp_auth.user_id_for_session_id", (SESSIONS,))
+def bench_session_exp_auth(size: int) -> Callable:
+    """
+    SessionExpAuth.user_id_for_session_id.
+    """
+    return bench_session("api.v1.auth.session_exp_auth.SessionExpAuth", size)
+
+
+@benchmark("session_db_auth.user_id_for_session_id", (SESSIONS,))
+def bench_session_db_auth(size: int) -> Callable:
+    """
+    SessionDBAuth.user_id_for_session_id, which reads the session file.
+    """
+    from models.base import DATA
+    DATA["UserSession"] = {}
+    return bench_session("api.v1.auth.session_db_auth.SessionDBAuth", size)
+
+
+def log_line(rng: random.Random) -> str:
+    """
+    Returns one generated "key=value;" log line.
+    """
+    return (
+        "name={};email={}@example.com;phone=555-{:04d};ssn={:03d}-{:02d}-"
+        "{:04d};password={:x};ip=10.0.{}.{};last_login=2019-11-14T06:16:24;"
+        "user_agent=Mozilla/5.0;"
+    ).format(
+        rng.choice(["Alice", "Bob", "Carol"]), rng.randrange(10 ** 6),
+        rng.randrange(10 ** 4), rng.randrange(1000), rng.randrange(100),
+        rng.randrange(10 ** 4), rng.getrandbits(64), rng.randrange(256),
+        rng.randrange(256),
+    )
+
+
+@benchmark("filtered_logger.filter_datum", (1,))
+def bench_filter_datum(size: int) -> Callable:
+    """
+    filter_datum of the PII fields on one log line.
+    """
+    from filtered_logger import filter_datum, PII_FIELDS
+    message = log_line(random.Random(SEED))
+    fields = list(PII_FIELDS)
+    return lambda: filter_datum(fields, "***", message, ";")
+
+
+@benchmark("filtered_logger.RedactingFormatter.format", (1,))
+def bench_redacting_formatter(size: int) -> Callable:
+    """
+    RedactingFormatter.format of one record.
+    """
+    import logging
+    from filtered_logger import RedactingFormatter, PII_FIELDS
+    formatter = RedactingFormatter(list(PII_FIELDS))
+    record = logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                               log_line(random.Random(SEED)), None, None)
+    return lambda: formatter.format(record)
+
+
+@benchmark("pii_detector.redact", (1,))
+def bench_pii_detector(size: int) -> Callable:
+    """
+    PIIDetector.redact of a free-text message holding an email.
+    """
+    from pii_detector import PIIDetector
+    detector = PIIDetector()
+    message = ("password reset requested by user42@example.com from "
+               "10.0.12.7 after 3 attempts")
+    return lambda: detector.redact(message)
+
+
+@benchmark("db.find_user_by", (DB_USERS,))
+def bench_find_user_by(size: int) -> Callable:
+    """
+    DB.find_user_by(email=...) on a table of size users.
+    """
+    from db import DB
+    db = DB()
+    for i in range(size):
+        db.add_user("user{}@example.com".format(i), "hash")
+    email = "user{}@example.com".format(size // 2)
+    return lambda: db.find_user_by(email=email)
+
+
+def measure(func: Callable, samples: int, min_time: float) -> List[float]:
+    """
+    Returns samples timings of func in seconds per call, each sample
+    looping enough calls to last about min_time.
+    """
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(
+            2, min(10, int(min_time / elapsed) + 1))
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+def git_commit() -> Optional[str]:
+    """
+    Returns the current commit of the repository, if known.
+    """
+    try:
+        return subprocess.check_output(
+            ["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options) -> dict:
+    """
+    Runs the selected benchmarks and returns the JSON report.
+    """
+    sizes = tuple(int(size) for size in options.sizes.split(","))
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="microbench-"))
+    try:
+        results = measure_all(options, sizes)
+    finally:
+        os.chdir(cwd)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "samples": options.samples,
+            "seed": SEED,
+        },
+        "results": results,
+    }
+
+
+def measure_all(options, sizes: Tuple[int, ...]) -> dict:
+    """
+    Measures the selected benchmarks in the current directory, where the
+    file storages write, and returns their results by key.
+    """
+    results = {}
+    for name, (factory, fixed_sizes) in BENCHMARKS.items():
+        if options.only and not any(part in name for part in options.only):
+            continue
+        for size in fixed_sizes or sizes:
+            key = "{}[{}]".format(name, size)
+            try:
+                func = factory(size)
+                timings = measure(func, options.samples, options.min_time)
+            except ImportError as e:
+                results[key] = {"skipped": str(e)}
+                continue
+            results[key] = {
+                "size": size,
+                "samples": timings,
+                "mean": mean(timings),
+                "median": median(timings),
+                "min": min(timings),
+                "stdev": stdev(timings) if len(timings) > 1 else 0.0,
+            }
+            print("{:55} {:>12.3f} us".format(key, median(timings) * 1e6),
+                  file=sys.stderr)
+    return results
+
+
+def mann_whitney_greater(new: List[float], old: List[float]) -> float:
+    """
+    One-sided p-value of the hypothesis that new timings are larger than
+    old ones (Mann-Whitney U, normal approximation with tie correction).
+    """
+    pooled = sorted(
+        [(value, 0) for value in new] + [(value, 1) for value in old]
+    )
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        count = j - i + 1
+        ties += count ** 3 - count
+        i = j + 1
+    n1, n2 = len(new), len(old)
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, pooled)
+                   if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / variance ** 0.5
+    return 1 - NormalDist().cdf(z)
+
+
+def compare(report: dict, baseline: dict, threshold: float,
+            alpha: float) -> Dict[str, dict]:
+    """
+    Compares a report with a baseline and returns the figures of every
+    benchmark present in both.
+    """
+    comparison = {}
+    for key, result in report["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if not base or "samples" not in base or "samples" not in result:
+            continue
+        ratio = median(result["samples"]) / median(base["samples"])
+        p_value = mann_whitney_greater(result["samples"], base["samples"])
+        comparison[key] = {
+            "baseline_median": median(base["samples"]),
+            "median": median(result["samples"]),
+            "ratio": round(ratio, 4),
+            "p_value": round(p_value, 6),
+            "slowdown": ratio > 1 + threshold and p_value < alpha,
+        }
+    return comparison
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Parses the command line, runs the benchmarks and compares them.
+    """
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks of the storage, auth and redaction "
+        "hot paths"
+    )
+    parser.add_argument("--sizes", default="1000,100000",
+                        help="object counts of the storage benchmarks, "
+                        "e.g. 1000,100000,1000000")
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="seconds per sample")
+    parser.add_argument("--only", nargs="*",
+                        help="run the benchmarks whose name contains one "
+                        "of these strings")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="relative slowdown ignored by --compare")
+    parser.add_argument("--alpha", type=float, default=0.01,
+                        help="significance level of --compare")
+    options = parser.parse_args(argv)
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+
+    report = run(options)
+    status = 0
+    if baseline is not None:
+        report["comparison"] = compare(
+            report, baseline, options.threshold, options.alpha
+        )
+        slow = [key for key, value in report["comparison"].items()
+                if value["slowdown"]]
+        for key in slow:
+            print("SLOWER: {} x{}".format(
+                key, report["comparison"][key]["ratio"]), file=sys.stderr)
+        status = 1 if slow else 0
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())